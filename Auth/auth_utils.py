@@ -1,9 +1,44 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
 from passlib.context import CryptContext
+from Config.config import BCRYPT_ROUNDS, HASH_POOL_SIZE, HASH_QUEUE_DEPTH
+from Utils.metrics import timed
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with a different cost are flagged by needs_update, so verify_and_update_password rehashes them on login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# bcrypt releases the GIL, so a small thread pool uses every core without contending with request threads.
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="bcrypt")
+# Admission control: at most pool size + queue depth hashes in flight. Everything past that is
+# rejected immediately, so the executor's queue (and the time a login waits in it) stays bounded.
+_hash_slots = threading.BoundedSemaphore(HASH_POOL_SIZE + HASH_QUEUE_DEPTH)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def _run_hashing(fn, *args):
+    # Awaited from async handlers: waiting on bcrypt holds neither the event loop nor a threadpool thread.
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many authentication requests, please retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        with timed("hash"):
+            return await asyncio.wrap_future(_hash_executor.submit(fn, *args))
+    finally:
+        _hash_slots.release()
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Return (is_valid, new_hash); new_hash is set when the stored hash should be replaced."""
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def warm_up() -> None:
+    """Load the bcrypt backend and start every hashing thread before the first login arrives."""
+    list(_hash_executor.map(pwd_context.hash, ["warm-up"] * HASH_POOL_SIZE))
@@ -1,24 +1,39 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from Models.user import User
-from Auth.jwt import decode_access_token
-from Database.database import get_db
+from Auth.jwt import decode_token
+from Auth.revocation import token_denylist
+from Auth.user_cache import user_cache, UserSnapshot
+from Database.database import get_async_read_db
+from Utils.metrics import timed
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    user_id = decode_access_token(token)
-    print(user_id)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)) -> UserSnapshot:
+    with timed("auth"):
+        claims = decode_token(token)
+        if not claims or not claims.get("sub"):
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user_id = int(claims["sub"])
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return user
+        if token_denylist.is_due():
+            await db.run_sync(token_denylist.refresh)
+        if token_denylist.is_revoked(claims.get("jti"), user_id, claims.get("iat")):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
 
-def admin_only(current_user: User = Depends(get_current_user)):
+        if user_cache.is_due():
+            await db.run_sync(user_cache.refresh)
+        snapshot = user_cache.get(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        return user_cache.put(user)
+
+async def admin_only(current_user: UserSnapshot = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin only route")
     return current_user
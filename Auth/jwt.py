@@ -1,16 +1,27 @@
+import secrets
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from Config.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    # jti identifies this token for logout; iat lets a user-wide revocation reject older tokens.
+    to_encode.update({"exp": expire, "iat": now, "jti": secrets.token_hex(16)})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
-def decode_access_token(token: str):
+def decode_token(token: str):
+    """The verified claims of `token`, or None when it is invalid or expired."""
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
     except JWTError:
         return None
+
+def decode_access_token(token: str):
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
+
+def warm_up() -> None:
+    """Round-trip one token so jose's key handling and algorithm lookup are loaded before the first request."""
+    decode_access_token(create_access_token(data={"sub": "warm-up"}, expires_delta=timedelta(seconds=30)))
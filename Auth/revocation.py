@@ -0,0 +1,228 @@
+"""Revoked access tokens, checked on every authenticated request without a query.
+
+Two kinds of revocation are kept, both in the database and in memory:
+
+- Single tokens, by their jti claim (logout). In memory they live in an
+  exact set fronted by a Bloom filter: a token that was never revoked
+  (nearly every request) is usually answered by the first one or two bit
+  probes, and a filter hit is confirmed against the set, so a false
+  positive never rejects a valid token.
+- All of a user's tokens issued before a cutoff (admin demotion, deletion),
+  compared against the iat claim.
+
+Entries are only needed until the tokens they cover expire, so expired ones
+are pruned from memory every REVOCATION_PRUNE_INTERVAL (the filter is
+rebuilt once most of what it holds has expired) and from the tables
+whenever a new revocation is written. Writes bump the "revocations" data
+version; each worker compares it at most once per REVOCATION_CHECK_INTERVAL
+and reads the revocations added since its last load when it moved. The
+lifespan loads all unexpired rows before the app reports ready.
+"""
+import calendar
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from Config.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE,
+    REVOCATION_CHECK_INTERVAL, REVOCATION_PRUNE_INTERVAL
+)
+from Models.revocation import RevokedToken, UserTokenCutoff
+from Utils.versions import bump_version, get_version
+
+REVOCATIONS = "revocations"
+
+
+def _epoch(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+@lru_cache(maxsize=None)
+def _bit_patterns(hashes: int) -> tuple:
+    rng = random.Random(hashes)
+    return tuple(sum(1 << bit for bit in rng.sample(range(64), hashes)) for _ in range(1 << 16))
+
+
+class BloomFilter:
+    """Blocked Bloom filter: a value sets `hashes` bits inside a single 64-bit word.
+
+    The bits come from a fixed table of precomputed patterns indexed by the low
+    16 bits of the hash, and the word by the rest, so a lookup is one hash, two
+    list reads and a mask test regardless of the number of hashes. Keeping a
+    value's bits in one word costs some accuracy, which is paid for with ~50%
+    more bits than a classic filter for the same error rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity = max(1, capacity)
+        bits = 1.5 * -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.blocks = max(1, math.ceil(bits / 64))
+        self.size = self.blocks * 64
+        self.hashes = max(1, min(8, round(self.size / capacity * math.log(2))))
+        self.count = 0
+        self.words = [0] * self.blocks
+        self.patterns = _bit_patterns(self.hashes)
+
+    def add(self, value: str) -> None:
+        h = hash(value)
+        self.words[(h >> 16) % self.blocks] |= self.patterns[h & 0xFFFF]
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        h = hash(value)
+        mask = self.patterns[h & 0xFFFF]
+        return self.words[(h >> 16) % self.blocks] & mask == mask
+
+
+class TokenDenylist:
+    # Rows committed shortly after a load may carry an earlier revoked_at; re-read this far back.
+    LOAD_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+                 check_interval: float = REVOCATION_CHECK_INTERVAL, prune_interval: float = REVOCATION_PRUNE_INTERVAL):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.check_interval = check_interval
+        self.prune_interval = prune_interval
+        self._tokens = {}
+        self._cutoffs = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self.version = None
+        self._loaded_at = None
+        self._checked_at = 0.0
+        self._pruned_at = time.monotonic()
+
+    def is_revoked(self, jti, user_id: int, issued_at) -> bool:
+        if jti is not None:
+            # BloomFilter.__contains__ inlined: this runs on every authenticated request.
+            bloom = self._bloom
+            h = hash(jti)
+            mask = bloom.patterns[h & 0xFFFF]
+            if bloom.words[(h >> 16) % bloom.blocks] & mask == mask and jti in self._tokens:
+                return True
+        cutoff = self._cutoffs.get(user_id)
+        # Tokens from before iat was added count as issued at the epoch.
+        return cutoff is not None and (issued_at or 0) < cutoff[0]
+
+    def is_due(self) -> bool:
+        now = time.monotonic()
+        return now - self._checked_at >= self.check_interval or now - self._pruned_at >= self.prune_interval
+
+    def refresh(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if get_version(db, REVOCATIONS) != self.version:
+                self.load(db)
+        if now - self._pruned_at >= self.prune_interval:
+            self.prune()
+
+    def load(self, db: Session) -> None:
+        """Read revocations from the tables: everything unexpired the first time, then only recent tokens."""
+        version = get_version(db, REVOCATIONS)
+        now = datetime.utcnow()
+        tokens = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        if self._loaded_at is not None:
+            tokens = tokens.where(RevokedToken.revoked_at >= self._loaded_at - self.LOAD_OVERLAP)
+        tokens = {jti: _epoch(expires_at) for jti, expires_at in db.execute(tokens)}
+        # Cutoffs are one row per user, so they are always read in full.
+        cutoffs = {
+            user_id: (_epoch(not_before), _epoch(expires_at))
+            for user_id, not_before, expires_at in db.execute(
+                select(UserTokenCutoff.user_id, UserTokenCutoff.not_before, UserTokenCutoff.expires_at)
+                .where(UserTokenCutoff.expires_at > now)
+            )
+        }
+        with self._lock:
+            if self._loaded_at is None:
+                self._rebuild(tokens)
+            else:
+                for jti, expires_at in tokens.items():
+                    self._add(jti, expires_at)
+            self._cutoffs = cutoffs
+            self.version = version
+            self._loaded_at = now
+
+    def prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            self._pruned_at = time.monotonic()
+            tokens = {jti: expires for jti, expires in self._tokens.items() if expires > now}
+            self._cutoffs = {user_id: cutoff for user_id, cutoff in self._cutoffs.items() if cutoff[1] > now}
+            # Expired entries only leave stale bits, which the exact set screens out; rebuild once most are stale.
+            if 2 * len(tokens) < self._bloom.count:
+                self._rebuild(tokens)
+            else:
+                self._tokens = tokens
+
+    def add_token(self, jti: str, expires_at: int) -> None:
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def add_cutoff(self, user_id: int, not_before: int, expires_at: int) -> None:
+        with self._lock:
+            self._cutoffs[user_id] = (not_before, expires_at)
+
+    def _add(self, jti: str, expires_at: int) -> None:
+        if jti in self._tokens:
+            return
+        self._tokens[jti] = expires_at
+        if self._bloom.count >= self._bloom.capacity:
+            # Past its capacity the filter's error rate climbs; rebuild it with room to grow.
+            self._rebuild(self._tokens)
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild(self, tokens: dict) -> None:
+        bloom = BloomFilter(max(self.capacity, 2 * len(tokens)), self.error_rate)
+        for jti in tokens:
+            bloom.add(jti)
+        # Readers never lock: the filter is complete before it is swapped in, and a token
+        # missing from it for that moment is one revoked in the same instant.
+        self._bloom, self._tokens = bloom, tokens
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self._tokens),
+            "user_cutoffs": len(self._cutoffs),
+            "bloom_bits": self._bloom.size,
+            "bloom_hashes": self._bloom.hashes,
+            "version": self.version,
+        }
+
+
+token_denylist = TokenDenylist()
+
+
+def _purge_expired(db: Session) -> None:
+    now = datetime.utcnow()
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    db.execute(delete(UserTokenCutoff).where(UserTokenCutoff.expires_at <= now))
+
+
+def revoke_token(db: Session, jti: str, user_id: int, expires_at: int) -> None:
+    """Persist one token's revocation in the caller's transaction; call token_denylist.add_token after commit."""
+    _purge_expired(db)
+    db.merge(RevokedToken(jti=jti, user_id=user_id, expires_at=datetime.utcfromtimestamp(expires_at)))
+    bump_version(db, REVOCATIONS)
+
+
+def revoke_user_tokens(db: Session, user_id: int):
+    """Revoke every token `user_id` holds now, in the caller's transaction.
+
+    iat has one-second resolution, so the cutoff is the start of the next
+    second: a token issued in the same second as the revocation is revoked
+    too. Returns (not_before, expires_at) as epoch seconds for
+    token_denylist.add_cutoff after commit.
+    """
+    not_before = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=1)
+    expires_at = not_before + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    _purge_expired(db)
+    db.merge(UserTokenCutoff(user_id=user_id, not_before=not_before, expires_at=expires_at))
+    bump_version(db, REVOCATIONS)
+    return _epoch(not_before), _epoch(expires_at)
@@ -0,0 +1,95 @@
+"""Bounded, short-lived cache of the users behind authenticated requests.
+
+Changes to existing accounts (premium and admin flags, deletion) bump the
+"accounts" data version in their transaction. The worker that made the
+change drops the entry at once; every other worker compares the version at
+most once per USER_CACHE_VERSION_CHECK_INTERVAL and empties its cache when
+it moved, so a demoted admin loses access within that interval rather than
+after USER_CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from Config.config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_VERSION_CHECK_INTERVAL
+from Utils.versions import ACCOUNTS, get_version
+
+
+class UserSnapshot:
+    """Read-only copy of the User columns that authenticated routes rely on."""
+
+    __slots__ = ("id", "name", "email", "is_active", "is_admin", "is_premium", "created_at")
+
+    def __init__(self, user):
+        self.id = user.id
+        self.name = user.name
+        self.email = user.email
+        self.is_active = user.is_active
+        self.is_admin = user.is_admin
+        self.is_premium = user.is_premium
+        self.created_at = user.created_at
+
+
+class UserCache:
+    """Bounded LRU of user id -> UserSnapshot whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 version_check_interval: float = USER_CACHE_VERSION_CHECK_INTERVAL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user) -> UserSnapshot:
+        snapshot = UserSnapshot(user)
+        if self.maxsize <= 0:
+            return snapshot
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def is_due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.version_check_interval
+
+    def refresh(self, db: Session) -> None:
+        self._checked_at = time.monotonic()
+        version = get_version(db, ACCOUNTS)
+        if version != self.version:
+            # Snapshots taken before this read may predate the change; drop them all.
+            self.clear()
+            self.version = version
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+user_cache = UserCache()
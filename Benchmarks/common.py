@@ -0,0 +1,85 @@
+"""Shared setup for the in-process benchmarks.
+
+Every benchmark runs against a throwaway SQLite file so it never touches
+ecommerce.db. Import this module before anything from the app so the
+environment below is in place when Config.config is loaded.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+BENCH_DIR = tempfile.mkdtemp(prefix="ecommerce-bench-")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(BENCH_DIR, 'bench.db')}")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("EMAIL_DISPATCHER_ENABLED", "false")
+# Load tests drive every request from one client IP; the limits would only measure 429s.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from Database.database import Base, engine, SessionLocal  # noqa: E402
+from Database.instrumentation import QueryCounter  # noqa: E402,F401
+from Auth.jwt import create_access_token  # noqa: E402
+from Models.user import User  # noqa: E402
+from Models.product import Product  # noqa: E402
+
+
+def create_schema():
+    import main  # registers every model on Base.metadata
+    main.create_schema()
+
+
+def create_user(email: str, is_admin: bool = False, is_premium: bool = False) -> User:
+    db = SessionLocal()
+    try:
+        # Benchmarks never log in with these accounts, so skip the bcrypt cost.
+        user = User(name=email.split("@")[0], email=email, hashed_password="!",
+                    is_admin=is_admin, is_premium=is_premium)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    finally:
+        db.close()
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user.id)})}"}
+
+
+def seed_products(count: int, stock: int = 10_000_000, price: float = 9.99) -> list:
+    db = SessionLocal()
+    try:
+        db.execute(
+            Product.__table__.insert(),
+            [
+                {"name": f"Product {i}", "description": f"Benchmark product {i}", "price": price,
+                 "stock": stock, "is_active": True, "is_premium": False}
+                for i in range(count)
+            ]
+        )
+        db.commit()
+        return [row.id for row in db.query(Product.id).order_by(Product.id.desc()).limit(count)]
+    finally:
+        db.close()
+
+
+def timed(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
@@ -0,0 +1,68 @@
+"""Bytes and latency of a poll that finds nothing changed, with and without ETags.
+
+    python -m Benchmarks.conditional_get [--products 5000] [--orders 500] [--limit 100] [--iterations 50]
+
+Seeds a catalog and one user's orders, then polls /products/getProducts,
+/orders/myOrders and /admin/getOrders the way a client would: a plain GET,
+a GET accepting gzip, and a conditional GET with the ETag of the previous
+response. p50 latency and the bytes on the wire are reported per variant.
+"""
+import argparse
+
+from Benchmarks.common import create_schema, create_user, auth_headers, seed_products, summarize, timed
+from Benchmarks.serialization import seed_orders
+
+from fastapi.testclient import TestClient
+
+
+def poll(client: TestClient, path: str, headers: dict, iterations: int) -> dict:
+    state = {}
+
+    def request():
+        state["response"] = client.get(path, headers=headers)
+
+    samples = timed(request, iterations)
+    response = state["response"]
+    return {
+        "status": response.status_code,
+        "p50_ms": summarize(samples)["p50_ms"],
+        # httpx decodes gzip transparently; Content-Length is what crossed the wire.
+        "bytes": int(response.headers.get("content-length", len(response.content))),
+        "etag": response.headers.get("etag"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    create_schema()
+    product_ids = seed_products(args.products)
+    user = create_user("conditional@bench.local")
+    admin = create_user("conditional-admin@bench.local", is_admin=True)
+    seed_orders(user.id, product_ids, args.orders)
+
+    import main as app_module
+    routes = [
+        ("/products/getProducts", auth_headers(user)),
+        ("/orders/myOrders", auth_headers(user)),
+        ("/admin/getOrders", auth_headers(admin)),
+    ]
+    with TestClient(app_module.create_app()) as client:
+        for path, headers in routes:
+            path = f"{path}?limit={args.limit}"
+            plain = poll(client, path, {**headers, "Accept-Encoding": "identity"}, args.iterations)
+            gzipped = poll(client, path, {**headers, "Accept-Encoding": "gzip"}, args.iterations)
+            revalidated = poll(client, path, {**headers, "Accept-Encoding": "gzip", "If-None-Match": gzipped["etag"]},
+                               args.iterations)
+            print(f"{path} (p50 of {args.iterations}):")
+            for label, result in (("full", plain), ("gzip", gzipped), ("if-none-match", revalidated)):
+                print(f"  {label:<14} {result['status']}  {result['p50_ms']:>8} ms  {result['bytes']:>8} bytes")
+
+
+if __name__ == "__main__":
+    main()
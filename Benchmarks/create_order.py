@@ -0,0 +1,51 @@
+"""Latency of POST /orders/createOrder as the cart grows.
+
+    python -m Benchmarks.create_order [--iterations 50]
+
+Order creation issues a fixed number of statements whatever the cart size:
+one product IN query, one set-based stock update, one data_versions upsert
+for the stock and order versions, the order insert, one batched item
+insert, the admin_stats update, one executemany upsert per analytics
+rollup table and the outbox row. The statement count and p50 should stay
+roughly flat from a 1-line cart to a 100-line cart; a count above the rest
+is a periodic version check landing in the measured request.
+"""
+import argparse
+
+from Benchmarks.common import (
+    create_schema, create_user, auth_headers, seed_products, QueryCounter, timed, summarize
+)
+
+CART_SIZES = (1, 5, 10, 25, 50, 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    create_schema()
+    headers = auth_headers(create_user("bench-buyer@example.com"))
+    product_ids = seed_products(max(CART_SIZES))
+
+    with TestClient(app) as client:
+        print(f"{'cart':>6} {'p50 ms':>9} {'p95 ms':>9} {'stmts':>6}")
+        for size in CART_SIZES:
+            payload = {"items": [{"product_id": pid, "quantity": 1} for pid in product_ids[:size]]}
+
+            def place_order():
+                response = client.post("/orders/createOrder", json=payload, headers=headers)
+                response.raise_for_status()
+
+            place_order()
+            with QueryCounter() as counter:
+                place_order()
+            stats = summarize(timed(place_order, args.iterations))
+            print(f"{size:>6} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {counter.count:>6}")
+
+
+if __name__ == "__main__":
+    main()
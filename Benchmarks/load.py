@@ -0,0 +1,428 @@
+"""Mixed-workload load test of the whole API, in-process.
+
+    python -m Benchmarks.load --workload mixed --requests 5000 --concurrency 16
+    python -m Benchmarks.load --products 1000000 --users 100000 --order-items 5000000 \\
+        --workload browse --output browse.json --compare baseline.json
+
+main.app is driven through httpx's ASGI transport, so no socket or server
+process is involved and the numbers measure the application and the
+database only. A throwaway SQLite file is seeded at the requested scale
+(reuse it across runs with --database and --skip-seed). SMTP is replaced by
+a local stub, so the outbox is drained without touching the network when
+--dispatcher is given.
+
+Each workload is a weighted mix of operations. The report lists p50/p95/p99
+latency, requests per second and SQL statements per request for every
+route, and is written as JSON so two commits can be compared with --compare.
+"""
+import argparse
+import os
+import sys
+
+_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+_parser.add_argument("--workload", choices=("browse", "checkout", "admin", "mixed"), default="mixed")
+_parser.add_argument("--requests", type=int, default=2000, help="timed requests (after warm-up)")
+_parser.add_argument("--warmup", type=int, default=200)
+_parser.add_argument("--concurrency", type=int, default=8)
+_parser.add_argument("--products", type=int, default=10_000)
+_parser.add_argument("--users", type=int, default=1_000)
+_parser.add_argument("--order-items", type=int, default=50_000)
+_parser.add_argument("--items-per-order", type=int, default=5)
+_parser.add_argument("--premium-ratio", type=float, default=0.1, help="share of premium users and products")
+_parser.add_argument("--database", help="SQLite file to seed or reuse (default: a temporary file)")
+_parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded --database")
+_parser.add_argument("--dispatcher", action="store_true", help="drain the outbox through the SMTP stub while running")
+_parser.add_argument("--seed", type=int, default=1234, help="random seed for data and request mix")
+_parser.add_argument("--output", default="benchmark-results.json")
+_parser.add_argument("--compare", help="earlier JSON result to print deltas against")
+ARGS = _parser.parse_args() if __name__ == "__main__" else _parser.parse_args([])
+
+# The database URL has to be in place before Benchmarks.common loads the app config.
+if ARGS.database:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(ARGS.database)}"
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import sqlite3  # noqa: E402
+import subprocess  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from contextvars import ContextVar  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+
+from sqlalchemy import event, func  # noqa: E402
+
+from Benchmarks.common import SessionLocal, create_schema, auth_headers, summarize  # noqa: E402
+from Database.database import ALL_ENGINES  # noqa: E402
+from Models.order import Order, OrderItem  # noqa: E402
+from Models.product import Product  # noqa: E402
+from Models.user import User  # noqa: E402
+
+CHUNK = 20_000
+LOGIN_EMAIL = "bench-login@example.com"
+LOGIN_PASSWORD = "benchmark-password"
+TOKEN_POOL = 500
+
+# Statements are attributed to the request whose context issued them; the
+# counter is a mutable list so threadpool copies of the context share it.
+_request_queries = ContextVar("bench_request_queries", default=None)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _product_price(index: int) -> float:
+    return round(1 + (index % 500) * 0.5, 2)
+
+
+def _insert_chunks(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK:
+            db.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.execute(table.insert(), batch)
+
+
+def seed_dataset(args, rng: random.Random) -> dict:
+    """Bulk-load products, users and orders, then rebuild the derived tables the app reads."""
+    from Auth.auth_utils import pwd_context
+    from Utils.analytics import rebuild_rollups
+    from Utils.stats import rebuild_stats
+
+    timings = {}
+    db = SessionLocal()
+    try:
+        # Seeding may add to an existing database, so new rows are addressed from the current maximum ids.
+        first_product = (db.query(func.max(Product.id)).scalar() or 0) + 1
+        first_user = (db.query(func.max(User.id)).scalar() or 0) + 1
+        last_order = db.query(func.max(Order.id)).scalar() or 0
+
+        start = time.perf_counter()
+        premium_every = max(1, round(1 / args.premium_ratio)) if args.premium_ratio > 0 else 0
+        _insert_chunks(db, Product.__table__, (
+            {"name": f"Product {i}", "description": f"Benchmark product {i}", "price": _product_price(i),
+             "stock": 1_000_000, "is_active": True, "is_premium": bool(premium_every) and i % premium_every == 0}
+            for i in range(args.products)
+        ))
+        db.commit()
+        timings["products_s"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        # Seeded accounts never log in, so they skip bcrypt; one real account serves /auth/login.
+        _insert_chunks(db, User.__table__, (
+            {"name": f"user{i}", "email": f"bench-user-{i}@example.com", "hashed_password": "!",
+             "is_active": True, "is_admin": i == 0,
+             "is_premium": bool(premium_every) and i % premium_every == 1}
+            for i in range(args.users)
+        ))
+        db.add(User(name="login", email=LOGIN_EMAIL, hashed_password=pwd_context.hash(LOGIN_PASSWORD)))
+        db.commit()
+        timings["users_s"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        orders = args.order_items // args.items_per_order
+        now = datetime.utcnow()
+        order_rows = []
+        item_rows = []
+        for order_index in range(orders):
+            order_id = last_order + order_index + 1
+            lines = [(rng.randrange(args.products), rng.randint(1, 3)) for _ in range(args.items_per_order)]
+            order_rows.append({
+                "id": order_id,
+                "user_id": first_user + rng.randrange(args.users),
+                "total_amount": round(sum(_product_price(p) * q for p, q in lines), 2),
+                "status": "completed" if rng.random() < 0.6 else "pending",
+                "created_at": now - timedelta(seconds=rng.randrange(365 * 86400)),
+            })
+            item_rows.extend(
+                {"order_id": order_id, "product_id": first_product + p, "quantity": q, "price": _product_price(p)}
+                for p, q in lines
+            )
+            if len(item_rows) >= CHUNK:
+                db.execute(Order.__table__.insert(), order_rows)
+                db.execute(OrderItem.__table__.insert(), item_rows)
+                order_rows, item_rows = [], []
+        if order_rows:
+            db.execute(Order.__table__.insert(), order_rows)
+        if item_rows:
+            db.execute(OrderItem.__table__.insert(), item_rows)
+        db.commit()
+        timings["orders_s"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        rebuild_stats(db)
+        rebuild_rollups(db)
+        timings["derived_tables_s"] = round(time.perf_counter() - start, 2)
+    finally:
+        db.close()
+    return timings
+
+
+def load_actors(args, rng: random.Random) -> dict:
+    db = SessionLocal()
+    try:
+        admin = db.query(User).filter(User.is_admin == True).order_by(User.id).first()
+        buyers = (
+            db.query(User)
+            .filter(User.is_admin == False, User.email != LOGIN_EMAIL)
+            .order_by(User.id)
+            .limit(TOKEN_POOL)
+            .all()
+        )
+        product_ids = [row.id for row in db.query(Product.id).filter(
+            Product.is_active == True, Product.is_premium == False).order_by(Product.id).limit(10_000)]
+        bounds = db.query(func.min(Order.created_at), func.max(Order.created_at)).one()
+    finally:
+        db.close()
+    if admin is None or not buyers or not product_ids:
+        raise SystemExit("The benchmark database needs an admin, some buyers and some standard products.")
+    return {
+        "admin": auth_headers(admin),
+        "buyers": [auth_headers(buyer) for buyer in buyers],
+        "product_ids": product_ids,
+        "first_order": bounds[0] or datetime.utcnow() - timedelta(days=30),
+        "last_order": bounds[1] or datetime.utcnow(),
+    }
+
+
+def _window(actors, rng: random.Random, days: int):
+    end = actors["last_order"] - timedelta(seconds=rng.randrange(max(1, days * 86400)))
+    return {"start": (end - timedelta(days=days)).isoformat(), "end": end.isoformat()}
+
+
+def _operations(actors, rng: random.Random, cursors: dict) -> dict:
+    """Every operation returns (route label, method, url, keyword arguments for the request)."""
+    def buyer():
+        return rng.choice(actors["buyers"])
+
+    def browse_first():
+        return "GET /products/getProducts", "GET", "/products/getProducts", {"headers": buyer()}
+
+    def browse_next():
+        params = {"cursor": cursors["products"]} if cursors.get("products") else {}
+        return "GET /products/getProducts", "GET", "/products/getProducts", {"headers": buyer(), "params": params}
+
+    def browse_filtered():
+        low = rng.randrange(1, 200)
+        return "GET /products/getProducts", "GET", "/products/getProducts", {
+            "headers": buyer(), "params": {"min_price": low, "max_price": low + 20, "limit": 20}}
+
+    def my_orders():
+        return "GET /orders/myOrders", "GET", "/orders/myOrders", {"headers": buyer(), "params": {"limit": 20}}
+
+    def me():
+        return "GET /auth/me", "GET", "/auth/me", {"headers": buyer()}
+
+    def checkout():
+        lines = rng.sample(actors["product_ids"], min(len(actors["product_ids"]), rng.randint(1, 5)))
+        payload = {"items": [{"product_id": pid, "quantity": rng.randint(1, 2)} for pid in lines]}
+        return "POST /orders/createOrder", "POST", "/orders/createOrder", {"headers": buyer(), "json": payload}
+
+    def login():
+        return "POST /auth/login", "POST", "/auth/login", {
+            "data": {"username": LOGIN_EMAIL, "password": LOGIN_PASSWORD}}
+
+    def admin_stats():
+        return "GET /admin/stats", "GET", "/admin/stats", {"headers": actors["admin"]}
+
+    def admin_orders():
+        return "GET /admin/getOrders", "GET", "/admin/getOrders", {
+            "headers": actors["admin"], "params": {"limit": 50}}
+
+    def admin_orders_by_status():
+        return "GET /admin/getOrders", "GET", "/admin/getOrders", {
+            "headers": actors["admin"], "params": {"limit": 50, "status": rng.choice(("pending", "completed"))}}
+
+    def admin_users():
+        return "GET /admin/getUsers", "GET", "/admin/getUsers", {
+            "headers": actors["admin"], "params": {"limit": 50}}
+
+    def admin_stock():
+        pid = rng.choice(actors["product_ids"])
+        return "GET /admin/products/{id}/stock", "GET", f"/admin/products/{pid}/stock", {"headers": actors["admin"]}
+
+    def sales_report():
+        granularity, days = rng.choice((("hour", 2), ("day", 30), ("month", 365)))
+        params = dict(_window(actors, rng, days), granularity=granularity)
+        return "GET /admin/analytics/sales", "GET", "/admin/analytics/sales", {
+            "headers": actors["admin"], "params": params}
+
+    def top_products():
+        params = dict(_window(actors, rng, 30), granularity="day", limit=10)
+        return "GET /admin/analytics/topProducts", "GET", "/admin/analytics/topProducts", {
+            "headers": actors["admin"], "params": params}
+
+    return {
+        "browse": [(browse_first, 40), (browse_next, 25), (browse_filtered, 15), (my_orders, 15), (me, 5)],
+        "checkout": [(checkout, 55), (my_orders, 20), (browse_first, 20), (login, 5)],
+        "admin": [(admin_stats, 20), (admin_orders, 20), (admin_orders_by_status, 15), (admin_users, 10),
+                  (admin_stock, 10), (sales_report, 15), (top_products, 10)],
+        "mixed": [(browse_first, 30), (browse_next, 15), (browse_filtered, 5), (my_orders, 10), (me, 5),
+                  (checkout, 20), (login, 1), (admin_stats, 3), (admin_orders, 3), (admin_users, 2),
+                  (admin_stock, 2), (sales_report, 2), (top_products, 2)],
+    }
+
+
+class _StubSMTP:
+    """Accepts every message, standing in for the SMTP server."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def noop(self):
+        return 250, b"OK"
+
+    def send_message(self, message):
+        self.sent += 1
+
+    def quit(self):
+        pass
+
+
+def stub_email(smtp: _StubSMTP):
+    from Utils.email_sender import email_dispatcher
+
+    email_dispatcher._connect = lambda: smtp
+
+
+async def run_workload(app, args, actors, rng: random.Random) -> dict:
+    import httpx
+
+    cursors = {}
+    mix = _operations(actors, rng, cursors)[args.workload]
+    operations, weights = zip(*mix)
+    samples = defaultdict(list)
+    queries = defaultdict(list)
+    errors = defaultdict(int)
+    budget = {"warmup": args.warmup, "timed": args.requests}
+
+    async def worker(client, phase):
+        timed = phase == "timed"
+        while budget[phase] > 0:
+            budget[phase] -= 1
+            label, method, url, kwargs = rng.choices(operations, weights)[0]()
+            counter = [0]
+            token = _request_queries.set(counter)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                _request_queries.reset(token)
+            if label == "GET /products/getProducts" and response.status_code == 200:
+                cursors["products"] = response.json().get("next_cursor")
+            if not timed:
+                continue
+            samples[label].append(elapsed)
+            queries[label].append(counter[0])
+            if response.status_code >= 400:
+                errors[label] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await asyncio.gather(*(worker(client, "warmup") for _ in range(args.concurrency)))
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client, "timed") for _ in range(args.concurrency)))
+            duration = time.perf_counter() - start
+
+    routes = {}
+    for label in sorted(samples):
+        routes[label] = dict(
+            summarize(samples[label]),
+            requests=len(samples[label]),
+            errors=errors[label],
+            rps=round(len(samples[label]) / duration, 1),
+            queries_per_request=round(sum(queries[label]) / len(queries[label]), 2),
+            max_queries=max(queries[label]),
+        )
+    every_sample = [sample for values in samples.values() for sample in values]
+    return {
+        "duration_s": round(duration, 3),
+        "overall": dict(summarize(every_sample), requests=len(every_sample),
+                        errors=sum(errors.values()), rps=round(len(every_sample) / duration, 1)),
+        "routes": routes,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: dict = None):
+    def delta(label, key):
+        if not baseline:
+            return ""
+        before = (baseline["overall"] if label is None else baseline["routes"].get(label, {})).get(key)
+        after = (report["overall"] if label is None else report["routes"][label])[key]
+        if not before:
+            return ""
+        return f" ({(after - before) / before * 100:+.0f}%)"
+
+    print(f"{'route':<36} {'reqs':>6} {'err':>4} {'p50 ms':>14} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'rps':>13} {'queries':>8}")
+    for label, stats in report["routes"].items():
+        print(f"{label:<36} {stats['requests']:>6} {stats['errors']:>4} "
+              f"{str(stats['p50_ms']) + delta(label, 'p50_ms'):>14} {stats['p95_ms']:>9} {stats['p99_ms']:>9} "
+              f"{str(stats['rps']) + delta(label, 'rps'):>13} {stats['queries_per_request']:>8}")
+    overall = report["overall"]
+    print(f"{'overall':<36} {overall['requests']:>6} {overall['errors']:>4} "
+          f"{str(overall['p50_ms']) + delta(None, 'p50_ms'):>14} {overall['p95_ms']:>9} {overall['p99_ms']:>9} "
+          f"{str(overall['rps']) + delta(None, 'rps'):>13}")
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    create_schema()
+    seeding = {} if args.skip_seed else seed_dataset(args, rng)
+
+    from main import app
+    from Utils.email_sender import email_dispatcher
+
+    smtp = _StubSMTP()
+    stub_email(smtp)
+    if args.dispatcher:
+        email_dispatcher.start()
+    for bind in ALL_ENGINES:
+        event.listen(bind, "before_cursor_execute", _count_statement)
+    try:
+        results = asyncio.run(run_workload(app, args, load_actors(args, rng), rng))
+    finally:
+        for bind in ALL_ENGINES:
+            event.remove(bind, "before_cursor_execute", _count_statement)
+        email_dispatcher.stop()
+
+    report = dict(
+        results,
+        workload=args.workload,
+        commit=_git_commit(),
+        recorded_at=datetime.utcnow().isoformat(timespec="seconds"),
+        python=sys.version.split()[0],
+        sqlite=sqlite3.sqlite_version,
+        config={key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        seeding=seeding,
+        emails_sent=smtp.sent,
+    )
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main(ARGS)
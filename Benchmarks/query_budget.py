@@ -0,0 +1,84 @@
+"""Statement budgets for the order read paths.
+
+    python -m Benchmarks.query_budget
+
+Seeds a buyer with a growing order history and checks that each endpoint
+runs the same number of statements whether the history holds one order or
+hundreds. Exits non-zero on the first endpoint that goes over budget, so a
+reintroduced lazy load fails loudly.
+
+Budgets are for a warm worker. get_current_user reads the user row only on
+a user-cache miss, and its periodic checks (the token denylist and accounts
+data versions) cost one statement each at most once per
+REVOCATION_CHECK_INTERVAL / USER_CACHE_VERSION_CHECK_INTERVAL. One
+unmeasured request per endpoint goes first, and both intervals are set
+longer than the run here, so the measured request never lands on a check.
+"""
+import os
+
+# Set before Benchmarks.common loads the config; the 1s defaults can elapse on a slow machine.
+os.environ.setdefault("REVOCATION_CHECK_INTERVAL", "3600")
+os.environ.setdefault("USER_CACHE_VERSION_CHECK_INTERVAL", "3600")
+
+from Benchmarks.common import create_schema, create_user, auth_headers, seed_products, SessionLocal  # noqa: E402
+from Database.instrumentation import query_budget, QueryBudgetExceeded  # noqa: E402
+from Models.order import Order, OrderItem  # noqa: E402
+
+# Statements per request once the caller is in the user cache and no periodic check is due:
+# the data_versions read behind the page's ETag, the page of orders, and their items.
+BUDGETS = {
+    "/orders/myOrders": 3,
+    "/admin/getOrders": 3,
+}
+HISTORY_SIZES = (1, 10, 200)
+ITEMS_PER_ORDER = 5
+
+
+def seed_orders(user_id: int, product_ids: list, count: int):
+    db = SessionLocal()
+    try:
+        for _ in range(count):
+            order = Order(user_id=user_id, total_amount=0.0, status="pending")
+            db.add(order)
+            db.flush()
+            db.add_all(
+                OrderItem(order_id=order.id, product_id=pid, quantity=1, price=1.0)
+                for pid in product_ids[:ITEMS_PER_ORDER]
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    create_schema()
+    buyer = create_user("budget-buyer@example.com")
+    admin = create_user("budget-admin@example.com", is_admin=True)
+    headers = {"/orders/myOrders": auth_headers(buyer), "/admin/getOrders": auth_headers(admin)}
+    product_ids = seed_products(ITEMS_PER_ORDER)
+
+    seeded = 0
+    failed = False
+    with TestClient(app) as client:
+        for size in HISTORY_SIZES:
+            seed_orders(buyer.id, product_ids, size - seeded)
+            seeded = size
+            for path, limit in BUDGETS.items():
+                client.get(path, headers=headers[path]).raise_for_status()
+                try:
+                    with query_budget(limit) as queries:
+                        client.get(path, headers=headers[path]).raise_for_status()
+                except QueryBudgetExceeded as e:
+                    failed = True
+                    print(f"FAIL {path} with {size} orders: {e}")
+                else:
+                    print(f"ok   {path} with {size} orders: {queries.count}/{limit} statements")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
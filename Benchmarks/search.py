@@ -0,0 +1,74 @@
+"""Latency of /products/search on a large catalog, from selective to broad terms.
+
+    python -m Benchmarks.search [--products 1000000] [--limit 20] [--iterations 20]
+
+Seeds a synthetic catalog whose words have very different frequencies, so
+the queries below range from a handful of matches to about 40% of the
+catalog, builds the FTS index, and times search_products for each query
+with and without facets. The match count of each query is reported next to
+its p50/p95. Queries with a term matching more than SEARCH_RANK_MAX_MATCHES
+products are listed newest first instead of ranked, and facets stop at
+SEARCH_FACET_MAX_MATCHES, so the broad terms should cost about what the
+selective ones do.
+"""
+import argparse
+import random
+
+from Benchmarks.common import SessionLocal, Product, create_schema, summarize, timed
+
+from sqlalchemy import text
+
+# (word, share of products whose name contains it)
+NAME_WORDS = (("classic", 0.40), ("steel", 0.05), ("walnut", 0.005), ("zephyr", 0.0002))
+FILLER = ("lamp", "chair", "kettle", "mug", "desk", "shelf", "rug", "clock", "vase", "stool")
+DESCRIPTION_WORDS = ("durable", "handmade", "compact", "portable", "classic", "modern", "quiet", "bright")
+QUERIES = ("zephyr", "walnut", "steel", "classic", "cl", "classic steel", "modern")
+
+
+def seed_catalog(count: int, batch: int = 50_000) -> None:
+    rng = random.Random(19)
+    db = SessionLocal()
+    try:
+        for start in range(0, count, batch):
+            rows = []
+            for i in range(start, min(count, start + batch)):
+                words = [word for word, share in NAME_WORDS if rng.random() < share]
+                words.append(rng.choice(FILLER))
+                description = " ".join(rng.sample(DESCRIPTION_WORDS, 3))
+                rows.append({"name": f"{' '.join(words)} {i}", "description": f"A {description} item",
+                             "price": round(rng.uniform(1, 800), 2), "stock": rng.randrange(0, 50),
+                             "is_active": True, "is_premium": rng.random() < 0.1})
+            db.execute(Product.__table__.insert(), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    seed_catalog(args.products)
+    from Utils.search import FTS_TABLE, parse_terms, _match_expression, rebuild_search_index, search_products
+
+    db = SessionLocal()
+    try:
+        print(f"indexed {rebuild_search_index(db)} products")
+        for query in QUERIES:
+            matches = db.execute(text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :m"),
+                                 {"m": _match_expression(parse_terms(query))}).scalar()
+            for facets in (False, True):
+                stats = summarize(timed(lambda: search_products(db, query, True, args.limit, facets=facets),
+                                        args.iterations))
+                label = f"{query!r}{' +facets' if facets else ''}"
+                print(f"{label:<24} {matches:>8} matches  p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Cost of building one 10k-row list response, ORM + pydantic vs column tuples.
+
+    python -m Benchmarks.serialization [--rows 10000] [--iterations 10]
+
+For a page of products and a page of orders (three items each) it times the
+path the list routes used to take -- ORM entities (selectinload for items),
+validated into the response model and rendered the way FastAPI does -- and
+the lean path in Utils/serialization.py, with orjson and with the json
+fallback. Query and encode time are reported separately, per page of
+--rows rows, and the bodies are checked to be byte-identical.
+"""
+import argparse
+import json
+
+from Benchmarks.common import create_schema, create_user, seed_products, summarize, timed
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+from Database.database import SessionLocal
+from Models.order import Order, OrderItem
+from Models.product import Product
+from Schemas.order import OrderPage
+from Schemas.product import ProductPage
+from Utils import serialization
+
+ITEMS_PER_ORDER = 3
+
+
+def seed_orders(user_id: int, product_ids: list, count: int) -> None:
+    db = SessionLocal()
+    try:
+        order_ids = db.execute(
+            insert(Order).returning(Order.id),
+            [{"user_id": user_id, "total_amount": 29.97, "status": "pending"} for _ in range(count)]
+        ).scalars().all()
+        db.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": product_ids[(order_id + i) % len(product_ids)], "quantity": 1, "price": 9.99}
+            for order_id in order_ids for i in range(ITEMS_PER_ORDER)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def render_like_fastapi(page_model, content) -> bytes:
+    adapter = TypeAdapter(page_model)
+    value = adapter.validate_python(content, from_attributes=True)
+    return json.dumps(jsonable_encoder(adapter.dump_python(value, mode="json")),
+                      ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def orm_products(db, rows):
+    return db.execute(select(Product).order_by(Product.id).limit(rows)).scalars().all()
+
+
+def lean_products(db, rows):
+    return serialization.rows_as_dicts(
+        db.execute(select(*serialization.PRODUCT_COLUMNS).order_by(Product.id).limit(rows)).all(),
+        serialization.PRODUCT_FIELDS,
+    )
+
+
+def orm_orders(db, rows):
+    return db.execute(
+        select(Order).options(selectinload(Order.items)).order_by(Order.id).limit(rows)
+    ).scalars().all()
+
+
+def lean_orders(db, rows):
+    orders = db.execute(select(*serialization.ORDER_COLUMNS).order_by(Order.id).limit(rows)).all()
+    items = db.execute(serialization.items_for([order.id for order in orders]))
+    return serialization.orders_with_items(orders, items)
+
+
+def measure(load, encode, rows: int, iterations: int) -> dict:
+    db = SessionLocal()
+    try:
+        state = {}
+
+        def query():
+            db.expunge_all()  # every iteration pays for a fresh identity map, as a request does
+            state["content"] = {"items": load(db, rows), "next_cursor": None}
+
+        def render():
+            state["body"] = encode(state["content"])
+
+        query_ms, encode_ms = [], []
+        for _ in range(iterations):
+            query_ms += timed(query, 1)
+            encode_ms += timed(render, 1)
+        return {
+            "query_p50_ms": summarize(query_ms)["p50_ms"],
+            "encode_p50_ms": summarize(encode_ms)["p50_ms"],
+            "total_p50_ms": round(summarize(query_ms)["p50_ms"] + summarize(encode_ms)["p50_ms"], 3),
+            "body": state["body"],
+        }
+    finally:
+        db.close()
+
+
+def json_fallback(content) -> bytes:
+    saved, serialization.orjson = serialization.orjson, None
+    try:
+        return serialization.dumps(content)
+    finally:
+        serialization.orjson = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    create_schema()
+    product_ids = seed_products(args.rows)
+    seed_orders(create_user("serialization@bench.local").id, product_ids, args.rows)
+
+    cases = {
+        "products": (ProductPage, orm_products, lean_products),
+        "orders": (OrderPage, orm_orders, lean_orders),
+    }
+    encoders = [("lean+json", json_fallback)]
+    if serialization.orjson is not None:
+        encoders.insert(0, ("lean+orjson", serialization.dumps))
+
+    for name, (page_model, orm_load, lean_load) in cases.items():
+        results = {"orm+pydantic": measure(orm_load, lambda content: render_like_fastapi(page_model, content),
+                                           args.rows, args.iterations)}
+        for label, encode in encoders:
+            results[label] = measure(lean_load, encode, args.rows, args.iterations)
+        baseline = results["orm+pydantic"]
+        print(f"{name} ({args.rows} rows per page, p50 of {args.iterations}):")
+        for label, stats in results.items():
+            if stats["body"] != baseline["body"]:
+                raise SystemExit(f"{name}: {label} body differs from the response_model output")
+            print(f"  {label:<13} query {stats['query_p50_ms']:>8} ms  encode {stats['encode_p50_ms']:>8} ms  "
+                  f"total {stats['total_p50_ms']:>8} ms  ({baseline['total_p50_ms'] / stats['total_p50_ms']:.1f}x)")
+        print(f"  bodies identical ({len(baseline['body'])} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Hammer a single SKU from many threads and check that it never oversells.
+
+    python -m Benchmarks.stock_contention [--threads 16] [--attempts 200] [--stock 1000]
+
+Each thread repeatedly reserves one unit through Utils.inventory.reserve_stock
+in its own session. At the end the number of successful reservations must
+equal the starting stock exactly and stock must sit at zero.
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from Benchmarks.common import create_schema, seed_products, SessionLocal
+from Models.product import Product
+from Utils.inventory import reserve_stock, OutOfStock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="reservations attempted per thread")
+    parser.add_argument("--stock", type=int, default=1000)
+    args = parser.parse_args()
+
+    create_schema()
+    (product_id,) = seed_products(1, stock=args.stock)
+
+    lock = threading.Lock()
+    counts = {"reserved": 0, "sold_out": 0, "busy": 0}
+    start_gate = threading.Barrier(args.threads)
+
+    def worker():
+        db = SessionLocal()
+        start_gate.wait()
+        try:
+            for _ in range(args.attempts):
+                try:
+                    reserve_stock(db, {product_id: 1})
+                    db.commit()
+                    outcome = "reserved"
+                except OutOfStock:
+                    db.rollback()
+                    outcome = "sold_out"
+                except OperationalError:
+                    db.rollback()
+                    outcome = "busy"
+                with lock:
+                    counts[outcome] += 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    remaining = db.query(Product.stock).filter(Product.id == product_id).scalar()
+    db.close()
+
+    attempts = args.threads * args.attempts
+    print(f"attempts={attempts} reserved={counts['reserved']} sold_out={counts['sold_out']} "
+          f"busy={counts['busy']} remaining={remaining} elapsed={elapsed:.2f}s "
+          f"({attempts / elapsed:.0f} attempts/s)")
+
+    if remaining < 0 or counts["reserved"] + remaining != args.stock:
+        raise SystemExit("FAIL: stock accounting is inconsistent (oversold or lost update)")
+    print("OK: no oversell, no lost updates")
+
+
+if __name__ == "__main__":
+    main()
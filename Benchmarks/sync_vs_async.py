@@ -0,0 +1,83 @@
+"""Sustained concurrent throughput of the sync and async database paths.
+
+    python -m Benchmarks.sync_vs_async [--concurrency 200] [--duration 5]
+
+Mounts two equivalent endpoints on a bare FastAPI app: one is a sync `def`
+on get_read_db (runs on the threadpool), the other an `async def` on
+get_async_read_db. Both load a product page by primary key. Each endpoint is
+driven by `concurrency` clients over an in-process ASGI transport, and
+requests per second plus p50/p95 latency are reported.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from Benchmarks.common import create_schema, seed_products, summarize
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from Database.database import get_read_db, get_async_read_db
+from Models.product import Product
+
+PAGE = 20
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync/{start}")
+def sync_page(start: int, db: Session = Depends(get_read_db)):
+    rows = db.query(Product).filter(Product.id >= start).order_by(Product.id).limit(PAGE).all()
+    return [row.id for row in rows]
+
+
+@bench_app.get("/async/{start}")
+async def async_page(start: int, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.execute(select(Product).where(Product.id >= start).order_by(Product.id).limit(PAGE))
+    return [row.id for row in result.scalars()]
+
+
+async def drive(client, path: str, product_ids: list, concurrency: int, duration: float) -> dict:
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(f"{path}/{random.choice(product_ids)}")
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests": len(samples), "rps": round(len(samples) / elapsed, 1), **summarize(samples)}
+
+
+async def run(concurrency: int, duration: float):
+    import httpx
+
+    create_schema()
+    product_ids = seed_products(10_000)
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/sync", "/async"):
+            await drive(client, path, product_ids, concurrency, min(duration, 1.0))  # warm the pools
+            stats = await drive(client, path, product_ids, concurrency, duration)
+            print(f"{path:>7}: {stats['rps']:>8} req/s  p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms  "
+                  f"({stats['requests']} requests)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,105 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 SMTP_SERVER=os.getenv("SMTP_SERVER")
 SMTP_PORT=os.getenv("SMTP_PORT")
 EMAIL_ADDRESS=os.getenv("EMAIL_ADDRESS")
-EMAIL_PASSWORD=os.getenv("EMAIL_PASSWORD")
\ No newline at end of file
+EMAIL_PASSWORD=os.getenv("EMAIL_PASSWORD")
+
+# Outbox dispatcher tuning
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_DISPATCHER_ENABLED = os.getenv("EMAIL_DISPATCHER_ENABLED", "true").lower() == "true"
+
+# List endpoint page sizes
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Product catalog cache
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+CATALOG_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", "1"))
+CATALOG_STOCK_SYNC_INTERVAL = float(os.getenv("CATALOG_STOCK_SYNC_INTERVAL", "15"))
+CATALOG_PAGE_CACHE_SIZE = int(os.getenv("CATALOG_PAGE_CACHE_SIZE", "256"))
+
+# Authenticated user cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("USER_CACHE_VERSION_CHECK_INTERVAL", "1"))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 2)))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", str(2 * (os.cpu_count() or 2))))
+
+# Database engine profile: "production" enables the SQLite PRAGMAs and the read/write pool split
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "production")
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "8"))
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "1"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+
+# Request metrics and the Prometheus /metrics endpoint
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Sampling profiler (admin controlled)
+PROFILER_BUFFER_SIZE = int(os.getenv("PROFILER_BUFFER_SIZE", "100"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+
+# Bulk product import / update uploads
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "5000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(1024 * 1024)))
+
+# Streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Product search. bm25 reads every product matching each term, so a query is ranked only while
+# each of its terms matches at most SEARCH_RANK_MAX_MATCHES products; broader queries list matches
+# newest first. Facets count at most the SEARCH_FACET_MAX_MATCHES newest matches.
+SEARCH_RANK_MAX_MATCHES = int(os.getenv("SEARCH_RANK_MAX_MATCHES", "2000"))
+SEARCH_FACET_MAX_MATCHES = int(os.getenv("SEARCH_FACET_MAX_MATCHES", "1000"))
+
+# Application startup: "production" skips create_all (run `python -m main create-schema` when deploying)
+APP_ENV = os.getenv("APP_ENV", "development")
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "false" if APP_ENV == "production" else "true").lower() == "true"
+STARTUP_WARMUP_ENABLED = os.getenv("STARTUP_WARMUP_ENABLED", "true").lower() == "true"
+
+# Idempotency-Key replay store
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "600"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+
+# Token revocation denylist (logout, admin demotion, user deletion)
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_CHECK_INTERVAL = float(os.getenv("REVOCATION_CHECK_INTERVAL", "1"))
+REVOCATION_PRUNE_INTERVAL = float(os.getenv("REVOCATION_PRUNE_INTERVAL", "60"))
+
+# Rate limiting: token buckets written as "<requests>/<seconds>"; an empty value disables that limit.
+# The "sqlite" backend keeps the buckets in a local file shared by every worker on the host.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "ratelimit.db")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+RATE_LIMIT_LOGIN_PER_IP = os.getenv("RATE_LIMIT_LOGIN_PER_IP", "10/60")
+RATE_LIMIT_REGISTER_PER_IP = os.getenv("RATE_LIMIT_REGISTER_PER_IP", "5/60")
+RATE_LIMIT_CREATE_ORDER_PER_IP = os.getenv("RATE_LIMIT_CREATE_ORDER_PER_IP", "120/60")
+RATE_LIMIT_CREATE_ORDER_PER_USER = os.getenv("RATE_LIMIT_CREATE_ORDER_PER_USER", "30/60")
+
+# Load shedding: requests in flight per worker before new ones get 503 (0 disables).
+# The expensive routes (login, register, createOrder) are shed first, at the lower limit.
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "512"))
+LOAD_SHED_EXPENSIVE_IN_FLIGHT = int(os.getenv("LOAD_SHED_EXPENSIVE_IN_FLIGHT", "128"))
+
+# Conditional GET (ETag / If-None-Match) and response compression for the list endpoints.
+# Brotli is offered when the optional "brotli" package is installed, gzip otherwise.
+ETAG_ENABLED = os.getenv("ETAG_ENABLED", "true").lower() == "true"
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
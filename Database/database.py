@@ -1,15 +1,95 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from Config.config import DATABASE_URL
-
-# Create engine
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+from Config.config import (
+    DATABASE_URL, DB_ENGINE_PROFILE, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW, DB_WRITE_POOL_SIZE, DB_POOL_TIMEOUT,
+    SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE
 )
 
-# Create session factory
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+PRODUCTION_PROFILE = DB_ENGINE_PROFILE == "production"
+
+def _async_url(url: str):
+    """Map the configured sync URL onto its async driver (aiosqlite / asyncpg)."""
+    url = make_url(url)
+    if url.drivername in ("sqlite", "sqlite+pysqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    if url.drivername in ("postgresql", "postgres", "postgresql+psycopg2"):
+        return url.set(drivername="postgresql+asyncpg")
+    return url
+
+def _engine_options(read_only: bool) -> dict:
+    options = {}
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+    if PRODUCTION_PROFILE:
+        options["pool_timeout"] = DB_POOL_TIMEOUT
+        if read_only:
+            options["pool_size"] = DB_READ_POOL_SIZE
+            options["max_overflow"] = DB_READ_MAX_OVERFLOW
+        else:
+            # One writer connection per engine: SQLite only ever admits a single writer anyway,
+            # so queueing in the pool is cheaper than spinning on SQLITE_BUSY.
+            options["pool_size"] = DB_WRITE_POOL_SIZE
+            options["max_overflow"] = 0
+    return options
+
+def _apply_sqlite_profile(sync_engine, read_only: bool):
+    """Install the production PRAGMAs on every new SQLite connection of `sync_engine`."""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        "PRAGMA query_only=ON" if read_only else "PRAGMA query_only=OFF",
+    ]
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        if not read_only:
+            # Let SQLAlchemy emit BEGIN itself (below) instead of the driver's deferred BEGIN.
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    if not read_only:
+        @event.listens_for(sync_engine, "begin")
+        def _on_begin(connection):
+            # Take the write lock up front so a transaction never fails upgrading a read lock mid-way.
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _build_engines(read_only: bool):
+    sync_engine = create_engine(DATABASE_URL, **_engine_options(read_only))
+    async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_options(read_only))
+    if IS_SQLITE and PRODUCTION_PROFILE:
+        _apply_sqlite_profile(sync_engine, read_only)
+        _apply_sqlite_profile(async_engine.sync_engine, read_only)
+    return sync_engine, async_engine
+
+# Create engines: writers for anything that mutates, readers for read-only routes
+engine, async_engine = _build_engines(read_only=False)
+if PRODUCTION_PROFILE:
+    read_engine, async_read_engine = _build_engines(read_only=True)
+else:
+    read_engine, async_read_engine = engine, async_engine
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = sessionmaker(
+    bind=async_read_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
+
+ALL_ENGINES = tuple({id(e): e for e in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine)}.values())
 
 # Base class for models
 Base = declarative_base()
@@ -21,3 +101,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Read-only dependency; sessions run on the reader pool
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async counterparts of get_db / get_read_db
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+# Startup warm-up: open each pool's steady-state connections before the first request needs them
+def _pool_size(sync_engine) -> int:
+    size = getattr(sync_engine.pool, "size", None)
+    return max(1, size()) if callable(size) else 1
+
+def warm_pools() -> int:
+    opened = 0
+    for sync_engine in {id(e): e for e in (engine, read_engine)}.values():
+        connections = [sync_engine.connect() for _ in range(_pool_size(sync_engine))]
+        for connection in connections:
+            connection.exec_driver_sql("SELECT 1")
+            connection.close()
+        opened += len(connections)
+    return opened
+
+async def warm_async_pools() -> int:
+    opened = 0
+    for async_eng in {id(e): e for e in (async_engine, async_read_engine)}.values():
+        connections = [await async_eng.connect() for _ in range(_pool_size(async_eng.sync_engine))]
+        for connection in connections:
+            await connection.exec_driver_sql("SELECT 1")
+            await connection.close()
+        opened += len(connections)
+    return opened
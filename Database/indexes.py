@@ -0,0 +1,230 @@
+"""Secondary indexes declared on the models, and a query-plan regression check.
+
+create_all only creates indexes together with their table, so databases
+created before an index was declared never get it. apply_indexes creates the
+missing ones in place (CREATE INDEX IF NOT EXISTS), leaving data untouched.
+
+check_plans runs EXPLAIN QUERY PLAN on the statements the routes issue and
+reports every one that reads a table without an index. Queries a route
+builds inline are rebuilt in route_statements; those of the shared helpers
+the routes call (search, idempotency, data versions, analytics, stock, the
+email dispatcher) are captured by running the helpers themselves. The check
+runs against a throwaway database created from the models, so it tests the
+declared indexes and never touches the configured one:
+
+    python -m Database.indexes apply
+    python -m Database.indexes check
+"""
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, delete, event, func, select, text
+from sqlalchemy.orm import selectinload, sessionmaker
+from Database.database import Base
+
+# "SCAN orders" is a full table read; "SCAN orders USING INDEX ..." walks an index in order.
+_TABLE_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def apply_indexes(bind) -> list:
+    """Create every index declared in Base.metadata that the database is missing; returns their names."""
+    created = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not bind.dialect.has_table(conn, table.name):
+                continue
+            existing = {index["name"] for index in bind.dialect.get_indexes(conn, table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    created.append(index.name)
+    return created
+
+
+def route_statements() -> dict:
+    """Representative statements for each route, built the same way the routes build them."""
+    from Models.order import Order, OrderItem
+    from Models.payment import Payment
+    from Models.product import Product
+    from Models.user import User
+    from Utils.pagination import encode_cursor, keyset_filter
+    from Utils.serialization import ORDER_COLUMNS, PRODUCT_COLUMNS, USER_COLUMNS, items_for
+
+    now = datetime.utcnow()
+    order_cursor = encode_cursor([now, 100])
+    id_cursor = encode_cursor([100])
+    order_key = [Order.created_at, Order.id]
+
+    return {
+        "GET /products/getProducts (standard)": keyset_filter(
+            select(*PRODUCT_COLUMNS).where(Product.is_active == True, Product.is_premium == False),
+            [Product.id], None, 50),
+        "GET /products/getProducts (premium)": keyset_filter(
+            select(*PRODUCT_COLUMNS).where(Product.is_active == True), [Product.id], id_cursor, 50),
+        "POST /orders/createOrder (products)": select(Product).where(
+            Product.id.in_([1, 2, 3]), Product.is_active == True),
+        "GET /orders/myOrders": keyset_filter(
+            select(*ORDER_COLUMNS).where(Order.user_id == 1), order_key, order_cursor, 50, descending=True),
+        "GET /orders/myOrders (status)": keyset_filter(
+            select(*ORDER_COLUMNS).where(Order.user_id == 1, Order.status == "pending"),
+            order_key, None, 50, descending=True),
+        "GET /orders/myOrders (items)": items_for([1, 2, 3]),
+        "DELETE /orders/orders/{id} (items)": delete(OrderItem).where(OrderItem.order_id == 1),
+        "GET /admin/getOrders": keyset_filter(
+            select(*ORDER_COLUMNS), order_key, order_cursor, 50, descending=True),
+        "GET /admin/getOrders (status)": keyset_filter(
+            select(*ORDER_COLUMNS).where(Order.status == "completed"), order_key, None, 50, descending=True),
+        "GET /admin/getOrders (range)": keyset_filter(
+            select(*ORDER_COLUMNS).where(Order.created_at >= now - timedelta(days=1)),
+            order_key, None, 50, descending=True),
+        "GET /admin/getUsers": keyset_filter(select(*USER_COLUMNS), [User.id], id_cursor, 50),
+        "POST /auth/login": select(User.id, User.hashed_password).where(User.email == "user@example.com"),
+        "POST /auth/register (existing email)": select(User.id).where(User.email == "user@example.com"),
+        "payments by order": select(Payment).where(Payment.order_id == 1),
+        "order relationship load": select(Order).options(selectinload(Order.items)).where(Order.id == 1),
+    }
+
+
+@contextmanager
+def _capture(bind, statements: list):
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # An executemany plans the same way for every row; explain it with the first.
+        statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def helper_statements(bind) -> dict:
+    """{name: (sql, parameters)} for the shared helpers the routes call, captured by running them on `bind`.
+
+    `bind` must be a scratch database (see scratch_database): the helpers write to it.
+    """
+    from Config.config import SEARCH_RANK_MAX_MATCHES
+    from Models.product import Product
+    from Utils.analytics import sales_buckets, top_products
+    from Utils.email_sender import EmailDispatcher, queue_email
+    from Utils.idempotency import idempotency_store
+    from Utils.inventory import OutOfStock, reserve_stock, stock_levels
+    from Utils.search import index_products, search_products
+    from Utils.versions import ACCOUNTS, ORDERS, STOCK, bump_versions, get_version, get_versions, user_orders
+
+    Session = sessionmaker(bind=bind)
+    now = datetime.utcnow()
+    with Session() as db:
+        # Enough matches for the newest-first search path as well as the ranked one.
+        db.execute(Product.__table__.insert(), [
+            {"name": f"Broad {i}", "description": "plan check", "price": 1.0, "stock": 1,
+             "is_active": True, "is_premium": False}
+            for i in range(SEARCH_RANK_MAX_MATCHES + 1)
+        ])
+        index_products(db, [product_id for product_id, in db.query(Product.id)])
+        queue_email(db, "plans@example.com", "Plan check", "")
+        db.commit()
+
+    runs = {
+        "GET /products/search (ranked)": lambda db: search_products(db, "plan rare", True, 20, facets=True),
+        "GET /products/search (newest first)": lambda db: search_products(db, "broad", False, 20, min_price=1),
+        "idempotency replay lookup": lambda db: idempotency_store.lookup(db, "createOrder:1", "plan-check"),
+        "data_versions reads": lambda db: (get_version(db, ACCOUNTS), get_versions(db, (STOCK, user_orders(1)))),
+        "data_versions bump": lambda db: bump_versions(db, STOCK, ORDERS, user_orders(1)),
+        "GET /admin/analytics/sales": lambda db: sales_buckets(db, "day", now - timedelta(days=7), now),
+        "GET /admin/analytics/topProducts": lambda db: top_products(db, "day", now - timedelta(days=7), now, 10),
+        "GET /admin/products/{id}/stock": lambda db: stock_levels(db, 1),
+        "POST /orders/createOrder (reserve)": lambda db: reserve_stock(db, {1: 1, 2: 1}, ORDERS, user_orders(1)),
+    }
+    captured = {}
+    for name, run in runs.items():
+        statements = []
+        with Session() as db, _capture(bind, statements):
+            try:
+                run(db)
+            except OutOfStock:
+                pass
+            db.rollback()
+        for number, statement in enumerate(statements, 1):
+            captured[name if len(statements) == 1 else f"{name} #{number}"] = statement
+
+    statements = []
+    dispatcher = EmailDispatcher(session_factory=Session, read_session_factory=Session)
+    with _capture(bind, statements):
+        dispatcher._claim_batch()
+    names = ("email dispatcher claim", "email dispatcher lease")
+    captured.update(zip(names, statements))
+    return captured
+
+
+def scratch_database(directory: str):
+    """A new SQLite database in `directory` with every table, index and the search index from the models."""
+    from Utils.search import create_search_index
+
+    bind = create_engine(f"sqlite:///{os.path.join(directory, 'plans.db')}")
+    Base.metadata.create_all(bind=bind)
+    create_search_index(bind)
+    return bind
+
+
+def _scans(plan) -> list:
+    # Scans of materialized subqueries (anon_N) are bounded by their LIMIT, not a table size.
+    scanned = (match.group(1) for match in (_TABLE_SCAN.match(row[-1]) for row in plan) if match)
+    return [table for table in scanned if table in Base.metadata.tables]
+
+
+def check_plans(bind) -> tuple:
+    """Return ({name: [scanned tables]}, statements checked) for every checked statement whose plan scans a table.
+
+    Runs the helpers on `bind`, so pass a scratch_database.
+    """
+    failures = {}
+    with bind.connect() as conn:
+        for name, stmt in route_statements().items():
+            sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+            scans = _scans(conn.execute(text("EXPLAIN QUERY PLAN " + sql)).all())
+            if scans:
+                failures[name] = scans
+    captured = helper_statements(bind)
+    with bind.connect() as conn:
+        for name, (sql, parameters) in captured.items():
+            scans = _scans(conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parameters).all())
+            if scans:
+                failures[name] = scans
+    return failures, len(route_statements()) + len(captured)
+
+
+def main(argv):
+    import Models.analytics, Models.idempotency, Models.order, Models.outbox, Models.payment  # noqa: F401
+    import Models.product, Models.revocation, Models.stats, Models.user, Models.version  # noqa: F401
+
+    command = argv[1] if len(argv) > 1 else "check"
+    if command not in ("apply", "check"):
+        raise SystemExit("usage: python -m Database.indexes [apply|check]")
+
+    if command == "apply":
+        from Database.database import engine
+        if engine.dialect.name != "sqlite":
+            raise SystemExit("The index tooling targets SQLite query plans.")
+        created = apply_indexes(engine)
+        print(f"Created {len(created)} index(es): {', '.join(created) or 'none missing'}")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        bind = scratch_database(directory)
+        try:
+            failures, checked = check_plans(bind)
+        finally:
+            bind.dispose()
+    if not failures:
+        print(f"All {checked} route queries use an index.")
+        return
+    for name, tables in failures.items():
+        print(f"{name}: full scan of {', '.join(tables)}")
+    raise SystemExit(1)
+
+if __name__ == "__main__":
+    main(sys.argv)
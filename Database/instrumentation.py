@@ -0,0 +1,47 @@
+from sqlalchemy import event
+from Database.database import ALL_ENGINES
+
+
+class QueryCounter:
+    """Counts SQL statements sent through the app's engines while the block is active.
+
+        with QueryCounter() as queries:
+            client.get("/orders/myOrders", headers=headers)
+        assert queries.count <= 3
+    """
+
+    def __init__(self, binds=ALL_ENGINES):
+        self.binds = binds
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for bind in self.binds:
+            event.listen(bind, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for bind in self.binds:
+            event.remove(bind, "before_cursor_execute", self._on_execute)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(QueryCounter):
+    """QueryCounter that raises QueryBudgetExceeded if more than `limit` statements ran."""
+
+    def __init__(self, limit: int, binds=ALL_ENGINES):
+        super().__init__(binds)
+        self.limit = limit
+
+    def __exit__(self, exc_type, *exc):
+        super().__exit__(exc_type, *exc)
+        if exc_type is None and self.count > self.limit:
+            listing = "\n".join(f"  {statement.splitlines()[0]}" for statement in self.statements)
+            raise QueryBudgetExceeded(f"{self.count} statements executed, budget is {self.limit}:\n{listing}")
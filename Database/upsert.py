@@ -0,0 +1,58 @@
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def upsert_increment(db: Session, table, keys: dict, increments: dict) -> None:
+    """Add `increments` to the row identified by `keys`, inserting it first if it is missing.
+
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL,
+    so concurrent writers never lose an increment. Other backends fall back to
+    UPDATE followed by INSERT when no row matched.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table).values(**keys, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+        )
+        db.execute(stmt)
+        return
+
+    condition = [table.c[column] == value for column, value in keys.items()]
+    result = db.execute(
+        update(table).where(*condition).values({column: table.c[column] + value for column, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        db.execute(table.insert().values(**keys, **increments))
+
+
+def upsert_increment_rows(db: Session, table, key_columns, rows: list) -> None:
+    """upsert_increment for many rows as one INSERT ... ON CONFLICT DO UPDATE.
+
+    Each row holds its key columns plus the increments for that row; every
+    row must have the same columns and a distinct key. The statement is
+    compiled once and run with executemany, which SQLAlchemy sends to
+    PostgreSQL as multi-row VALUES. Other backends fall back to one
+    upsert_increment per row.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    increments = [column for column in rows[0] if column not in key_columns]
+    if dialect not in ("sqlite", "postgresql"):
+        for row in rows:
+            upsert_increment(db, table, {column: row[column] for column in key_columns},
+                             {column: row[column] for column in increments})
+        return
+
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+    )
+    # One cached statement executed over every row; the driver batches it (executemany).
+    db.execute(stmt, rows)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, DateTime, String
+from Database.database import Base
+
+class SalesRollup(Base):
+    __tablename__ = "sales_rollup"
+
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    units = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    completed_revenue = Column(Float, nullable=False, default=0.0)
+
+class ProductSalesRollup(Base):
+    __tablename__ = "product_sales_rollup"
+
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime
+from Database.database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_expires", "expires_at"),
+        Index("ix_revoked_tokens_revoked", "revoked_at"),
+    )
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+class UserTokenCutoff(Base):
+    """Every token of `user_id` issued before `not_before` is revoked; kept until the last of them expires."""
+    __tablename__ = "user_token_cutoffs"
+    __table_args__ = (
+        Index("ix_user_token_cutoffs_expires", "expires_at"),
+    )
+
+    user_id = Column(Integer, primary_key=True)
+    not_before = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, Float, DateTime
+from datetime import datetime
+from Database.database import Base
+
+class AdminStatsCounter(Base):
+    __tablename__ = "admin_stats"
+
+    id = Column(Integer, primary_key=True)
+    total_users = Column(Integer, nullable=False, default=0)
+    total_orders = Column(Integer, nullable=False, default=0)
+    total_products = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0.0)
+    rebuilt_at = Column(DateTime, default=datetime.utcnow)
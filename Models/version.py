@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, String
+from Database.database import Base
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,115 +1,292 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+from fastapi.responses import PlainTextResponse
+from datetime import datetime
 from Auth.dependencies import get_current_user, admin_only
 from Models.user import User
 from Models.order import Order, OrderItem
 from Models.product import Product
-from Schemas.user import UserOut, UpdatePremiumStatus, UserCreate, UpdateAdminStatus
-from Schemas.order import OrderOut
-from Schemas.product import ProductOut, ProductCreate, ProductUpdate
-from Database.database import get_db
-from Schemas.admin import AdminStats
-from sqlalchemy import func
-from Utils.email_sender import send_confirmation_email
+from Schemas.user import UserOut, UserPage, UpdatePremiumStatus, UserCreate, UpdateAdminStatus
+from Schemas.order import OrderPage
+from Schemas.product import ProductOut, ProductPage, ProductCreate, ProductUpdate, StockLevelsOut
+from Database.database import get_db, get_read_db, get_async_db, get_async_read_db
+from Schemas.admin import AdminStats, ProfilerSettings, ProfilerStatus, ProfileSummary
+from Utils.email_sender import queue_email
+from Utils.inventory import release_stock, stock_levels
+from Utils.pagination import keyset_page
+from Utils import conditional, serialization
+from Utils.versions import bump_version, bump_versions, bump_order_versions, CATALOG, STOCK, USERS, ORDERS, ACCOUNTS
+from Utils.search import index_products, unindex_products
+from Utils.catalog_cache import catalog_cache
+from Utils.stats import bump_stats, read_stats, compute_stats
+from Utils.analytics import record_completion, record_order_removed
+from Config.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from Auth.auth_utils import hash_password
+from Auth.user_cache import user_cache, UserSnapshot
+from Auth.revocation import token_denylist, revoke_user_tokens
+from Utils.profiler import sampling_profiler, merged_collapsed
+from Utils.idempotency import IdempotentRequest, idempotency_key
 
 
 router = APIRouter()
 
-@router.get("/getUsers", response_model=List[UserOut])
-def list_users(db: Session = Depends(get_db), _: User = Depends(admin_only)):
-    return db.query(User).all()
-
-@router.get("/getOrders", response_model=List[OrderOut])
-def list_orders(db: Session = Depends(get_db), _: User = Depends(admin_only)):
-    return db.query(Order).all()
-
-@router.get("/getProducts", response_model=List[ProductOut])
-def list_all_products(db: Session = Depends(get_db), _: User = Depends(admin_only)):
-    return db.query(Product).all()
+@router.get("/getUsers", response_model=UserPage)
+def list_users(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    is_premium: Optional[bool] = None,
+    is_active: Optional[bool] = None,
+    db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only)
+):
+    etag = conditional.version_etag(db, (USERS,), "getUsers", request.url.query)
+    unchanged = conditional.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    query = db.query(*serialization.USER_COLUMNS)
+    if is_admin is not None:
+        query = query.filter(User.is_admin == is_admin)
+    if is_premium is not None:
+        query = query.filter(User.is_premium == is_premium)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+
+    users, next_cursor = keyset_page(query, [User.id], cursor, limit)
+    body = serialization.page_body(serialization.rows_as_dicts(users, serialization.USER_FIELDS), next_cursor)
+    return conditional.respond(request, body, etag)
+
+@router.get("/getOrders", response_model=OrderPage)
+def list_orders(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only)
+):
+    etag = conditional.version_etag(db, (ORDERS,), "getOrders", request.url.query)
+    unchanged = conditional.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    query = db.query(*serialization.ORDER_COLUMNS)
+    if status is not None:
+        query = query.filter(Order.status == status)
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+    if created_from is not None:
+        query = query.filter(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(Order.created_at < created_to)
+
+    orders, next_cursor = keyset_page(query, [Order.created_at, Order.id], cursor, limit, descending=True)
+    items = db.execute(serialization.items_for([order.id for order in orders])) if orders else ()
+    body = serialization.page_body(serialization.orders_with_items(orders, items), next_cursor)
+    return conditional.respond(request, body, etag)
+
+@router.get("/getProducts", response_model=ProductPage)
+def list_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    is_premium: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only)
+):
+    etag = conditional.version_etag(db, (CATALOG, STOCK), "adminGetProducts", request.url.query)
+    unchanged = conditional.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    query = db.query(*serialization.PRODUCT_COLUMNS)
+    if is_active is not None:
+        query = query.filter(Product.is_active == is_active)
+    if is_premium is not None:
+        query = query.filter(Product.is_premium == is_premium)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    products, next_cursor = keyset_page(query, [Product.id], cursor, limit)
+    body = serialization.page_body(serialization.rows_as_dicts(products, serialization.PRODUCT_FIELDS), next_cursor)
+    return conditional.respond(request, body, etag)
 
 @router.post("/createProduct", response_model=ProductOut)
-def create_product(product: ProductCreate, db: Session = Depends(get_db), _: User = Depends(admin_only)):
+def create_product(product: ProductCreate, db: Session = Depends(get_db), _: UserSnapshot = Depends(admin_only)):
     new_product = Product(**product.dict())
     db.add(new_product)
+    db.flush()
+    index_products(db, [new_product.id])
+    bump_stats(db, products=1)
+    version = bump_version(db, CATALOG)
     db.commit()
     db.refresh(new_product)
+    catalog_cache.apply_product(new_product, version)
     return new_product
 
 @router.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db), _: User = Depends(admin_only)):
+def delete_product(product_id: int, db: Session = Depends(get_db), _: UserSnapshot = Depends(admin_only)):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     db.delete(product)
+    unindex_products(db, [product_id])
+    bump_stats(db, products=-1)
+    version = bump_version(db, CATALOG)
     db.commit()
+    catalog_cache.remove_product(product_id, version)
     return {"message": "Product deleted successfully"}
 
+@router.get("/products/{product_id}/stock", response_model=StockLevelsOut)
+def get_stock_levels(product_id: int, db: Session = Depends(get_read_db), _: UserSnapshot = Depends(admin_only)):
+    levels = stock_levels(db, product_id)
+    if levels is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return levels
+
+@router.get("/userCacheStats")
+def get_user_cache_stats(_: UserSnapshot = Depends(admin_only)):
+    return user_cache.stats()
+
+@router.get("/profiler", response_model=ProfilerStatus)
+def get_profiler_status(_: UserSnapshot = Depends(admin_only)):
+    return sampling_profiler.settings()
+
+@router.put("/profiler", response_model=ProfilerStatus)
+def configure_profiler(settings: ProfilerSettings, _: UserSnapshot = Depends(admin_only)):
+    return sampling_profiler.configure(settings.enabled, settings.routes, settings.sample_rate, settings.interval_ms)
+
+@router.get("/profiler/profiles", response_model=List[ProfileSummary])
+def list_profiles(route: Optional[str] = None, _: UserSnapshot = Depends(admin_only)):
+    return [capture.summary() for capture in sampling_profiler.captures() if route is None or capture.route == route]
+
+@router.get("/profiler/profiles/collapsed", response_class=PlainTextResponse)
+def download_merged_profile(route: Optional[str] = None, _: UserSnapshot = Depends(admin_only)):
+    captures = [capture for capture in sampling_profiler.captures() if route is None or capture.route == route]
+    return PlainTextResponse(merged_collapsed(captures))
+
+@router.get("/profiler/profiles/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: int, _: UserSnapshot = Depends(admin_only)):
+    capture = sampling_profiler.get(profile_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(capture.collapsed())
+
+@router.delete("/profiler/profiles")
+def clear_profiles(_: UserSnapshot = Depends(admin_only)):
+    sampling_profiler.clear()
+    return {"message": "Profiles cleared"}
+
 @router.get("/stats", response_model=AdminStats)
-def get_admin_stats(db: Session = Depends(get_db), _: User = Depends(admin_only)):
-    total_users = db.query(func.count(User.id)).scalar()
-    total_orders = db.query(func.count(Order.id)).scalar()
-    total_products = db.query(func.count(Product.id)).scalar()
-    total_revenue = db.query(func.coalesce(func.sum(Order.total_amount), 0)).scalar()
-
-    return AdminStats(
-        total_users=total_users,
-        total_orders=total_orders,
-        total_products=total_products,
-        total_revenue=total_revenue
-    )
+def get_admin_stats(db: Session = Depends(get_read_db), _: UserSnapshot = Depends(admin_only)):
+    # The totals row is built at startup; fall back to full aggregates only if it is missing.
+    totals = read_stats(db) or compute_stats(db)
+    return AdminStats(**totals)
 
 @router.patch("/admin/orders/{order_id}/complete")
-def complete_order(order_id: int, db: Session = Depends(get_db), _: User = Depends(admin_only)):
-    order = db.query(Order).filter(Order.id == order_id).first()
+def complete_order(
+    order_id: int,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only),
+    idempotency: Optional[IdempotentRequest] = Depends(idempotency_key("completeOrder"))
+):
+    if idempotency is not None:
+        replay = idempotency.replay(read_db)
+        read_db.rollback()
+        if replay is not None:
+            return replay
+
+    order = db.query(Order).options(joinedload(Order.user)).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    if order.status != "completed":
+        record_completion(db, order.created_at, order.total_amount)
     order.status = "completed"
-    db.commit()
+    bump_order_versions(db, order.user_id)
 
     subject = f"Order #{order.id} Completed"
     body = f"Hi,\n\nYour order #{order.id} has been completed and is on its way!\n\nThank you for shopping!"
-    mail_res = send_confirmation_email(order.user.email, subject, body)
-    if not mail_res:
-        raise HTTPException(status_code=500, detail="Failed to send order confirmation email.")
-    return {"message": f"Order #{order.id} marked as completed and customer notified."}
+    queue_email(db, order.user.email, subject, body)
+    result = {"message": f"Order #{order.id} marked as completed and customer notified."}
+    if idempotency is not None:
+        try:
+            response = idempotency.record(db, serialization.dumps(result))
+        except IntegrityError:
+            db.rollback()
+            replay = idempotency.replay(read_db)
+            if replay is None:
+                raise
+            return replay
+        db.commit()
+        idempotency.committed()
+        return response
+    db.commit()
+    return result
 
 @router.post("/createAdmin", response_model=UserOut)
-def create_admin(
+async def create_admin(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(admin_only)
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db),
+    _: UserSnapshot = Depends(admin_only)
 ):
-    existing = db.query(User).filter(User.email == user_data.email).first()
+    existing = await read_db.scalar(select(User.id).where(User.email == user_data.email))
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
 
+    # Hashed before the writer's first statement, so the write lock is not held through bcrypt.
+    hashed_password = await hash_password(user_data.password)
     new_admin = User(
         name=user_data.name,
         email=user_data.email,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=hashed_password,
         is_admin=True,
         is_active=True
     )
 
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.run_sync(bump_stats, users=1)
+    await db.run_sync(bump_versions, USERS)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User already exists")
+    await db.refresh(new_admin)
     return new_admin
 
 @router.delete("/orders/{order_id}")
-def delete_order_by_id(order_id: int, db: Session = Depends(get_db), _: User = Depends(admin_only)):
+def delete_order_by_id(order_id: int, db: Session = Depends(get_db), _: UserSnapshot = Depends(admin_only)):
     order = db.query(Order).filter(Order.id == order_id).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    levels = release_stock(db, order)
+    record_order_removed(db, order)
     db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
 
     db.delete(order)
+    bump_stats(db, orders=-1, revenue=-order.total_amount)
+    bump_order_versions(db, order.user_id)
     db.commit()
+    catalog_cache.apply_stock(levels)
     
     return {"message": f"Order #{order_id} deleted successfully"}
 
@@ -117,7 +294,7 @@ def delete_order_by_id(order_id: int, db: Session = Depends(get_db), _: User = D
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(admin_only)
+    current_user: UserSnapshot = Depends(admin_only)
 ):
     if current_user.id == user_id:
         raise HTTPException(status_code=403, detail="You cannot delete your own account.")
@@ -127,7 +304,12 @@ def delete_user(
         raise HTTPException(status_code=404, detail="User not found")
 
     db.delete(user)
+    bump_stats(db, users=-1)
+    bump_versions(db, USERS, ACCOUNTS)
+    cutoff = revoke_user_tokens(db, user_id)
     db.commit()
+    token_denylist.add_cutoff(user_id, *cutoff)
+    user_cache.invalidate(user_id)
     return {"message": f"User ID {user_id} deleted successfully"}
 
 @router.patch("/products/{product_id}", response_model=ProductOut)
@@ -135,17 +317,23 @@ def update_product(
     product_id: int,
     updated_data: ProductUpdate,
     db: Session = Depends(get_db),
-    _: User = Depends(admin_only)
+    _: UserSnapshot = Depends(admin_only)
 ):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    for field, value in updated_data.dict(exclude_unset=True).items():
+    changes = updated_data.dict(exclude_unset=True)
+    for field, value in changes.items():
         setattr(product, field, value)
+    if "name" in changes or "description" in changes:
+        db.flush()
+        index_products(db, [product.id])
 
+    version = bump_version(db, CATALOG)
     db.commit()
     db.refresh(product)
+    catalog_cache.apply_product(product, version)
     return product
 
 @router.patch("/users/{user_id}/premium", response_model=UserOut)
@@ -153,7 +341,7 @@ def update_premium_status(
     user_id: int,
     payload: UpdatePremiumStatus,
     db: Session = Depends(get_db),
-    _: User = Depends(admin_only)
+    _: UserSnapshot = Depends(admin_only)
 ):
     user = db.query(User).filter(User.id == user_id).first()
 
@@ -162,9 +350,7 @@ def update_premium_status(
 
     previous_status = user.is_premium
     user.is_premium = payload.is_premium
-    db.commit()
-    db.refresh(user)
-    
+
     if previous_status != user.is_premium:
         if user.is_premium:
             subject = "🎉 You're now a Premium Member!"
@@ -173,9 +359,11 @@ def update_premium_status(
             subject = "⚠️ Premium Membership Ended"
             body = f"Hi {user.name},\n\nYour premium membership has been deactivated.\nYou now have access to regular features.\n\nIf this was unexpected, please contact support."
 
-        mail_res = send_confirmation_email(user.email, subject, body)
-        if not mail_res:
-            raise HTTPException(status_code=500, detail="Failed to send email.")
+        queue_email(db, user.email, subject, body)
+        bump_versions(db, USERS, ACCOUNTS)
+    db.commit()
+    db.refresh(user)
+    user_cache.invalidate(user.id)
     return user
 
 @router.patch("/users/{user_id}/admin", response_model=UserOut)
@@ -183,7 +371,7 @@ def update_admin_status(
     user_id: int,
     payload: UpdateAdminStatus,
     db: Session = Depends(get_db),
-    current_user: User = Depends(admin_only)
+    current_user: UserSnapshot = Depends(admin_only)
 ):
     if current_user.id == user_id:
         raise HTTPException(status_code=403, detail="You cannot change your own admin status.")
@@ -195,9 +383,7 @@ def update_admin_status(
 
     previous_status = user.is_admin
     user.is_admin = payload.is_admin
-    db.commit()
-    db.refresh(user)
-    
+
     if previous_status != user.is_admin:
         if user.is_admin:
             subject = "🎉 You've been promoted to Admin!"
@@ -206,9 +392,15 @@ def update_admin_status(
             subject = "⚠️ Admin access removed"
             body = f"Hi {user.name},\n\nYour admin access has been revoked.\nYou now have normal user privileges.\n\nIf you believe this is a mistake, please contact support."
 
-        mail_res = send_confirmation_email(user.email, subject, body)
-        if not mail_res:
-            raise HTTPException(status_code=500, detail="Failed to send email.")
+        queue_email(db, user.email, subject, body)
+        bump_versions(db, USERS, ACCOUNTS)
+    # Tokens issued while the user was an admin stop working everywhere, not just once the user caches expire.
+    cutoff = revoke_user_tokens(db, user.id) if previous_status and not user.is_admin else None
+    db.commit()
+    if cutoff:
+        token_denylist.add_cutoff(user.id, *cutoff)
+    db.refresh(user)
+    user_cache.invalidate(user.id)
     return user
 
 
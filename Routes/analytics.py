@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal
+from datetime import datetime
+from Auth.dependencies import admin_only
+from Auth.user_cache import UserSnapshot
+from Schemas.analytics import SalesBucketOut, ProductSalesOut
+from Database.database import get_read_db
+from Utils.analytics import sales_buckets, top_products
+
+router = APIRouter()
+
+Granularity = Literal["hour", "day", "month"]
+
+def _check_range(start: datetime, end: datetime):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+@router.get("/sales", response_model=List[SalesBucketOut])
+def get_sales(
+    start: datetime,
+    end: datetime,
+    granularity: Granularity = "day",
+    db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only)
+):
+    _check_range(start, end)
+    return sales_buckets(db, granularity, start, end)
+
+@router.get("/topProducts", response_model=List[ProductSalesOut])
+def get_top_products(
+    start: datetime,
+    end: datetime,
+    granularity: Granularity = "day",
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    _: UserSnapshot = Depends(admin_only)
+):
+    _check_range(start, end)
+    return top_products(db, granularity, start, end, limit)
@@ -1,49 +1,98 @@
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from Database.database import SessionLocal, get_db
+from Database.database import SessionLocal, get_db, get_async_db, get_async_read_db
 from Models.user import User
 from Schemas.user import UserCreate, UserOut, UserLogin, Token
-from Auth.auth_utils import hash_password, verify_password
-from Auth.jwt import create_access_token
-from Utils.email_sender import send_confirmation_email
-from Auth.dependencies import get_current_user
+from Auth.auth_utils import hash_password, verify_and_update_password
+from Auth.jwt import create_access_token, decode_token
+from Auth.revocation import token_denylist, revoke_token, revoke_user_tokens
+from Utils.email_sender import queue_email
+from Utils.stats import bump_stats
+from Utils.versions import USERS, bump_versions
+from Utils.rate_limit import rate_limit
+from Config.config import RATE_LIMIT_LOGIN_PER_IP, RATE_LIMIT_REGISTER_PER_IP
+from Auth.dependencies import get_current_user, oauth2_scheme
+from Auth.user_cache import UserSnapshot
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter()
 
-@router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+@router.post("/register", response_model=UserOut,
+             dependencies=[Depends(rate_limit("register", per_ip=RATE_LIMIT_REGISTER_PER_IP))])
+async def register(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
+):
+    existing_user = await read_db.scalar(select(User.id).where(User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user.password)
+    # Hash before the writer's first statement: BEGIN IMMEDIATE would hold the write lock through bcrypt.
+    hashed_pw = await hash_password(user.password)
     new_user = User(
         name=user.name,
         email=user.email,
         hashed_password=hashed_pw
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+
     subject = "Welcome to MyShop!"
     body = f"Hello {user.name},\n\nThank you for registering at MyShop.\n\nBest Regards,\nTeam Vasist General Store"
-    mail_res = send_confirmation_email(user.email,subject,body)
-    if not mail_res:
-        raise HTTPException(status_code=500, detail="Registration Successfull, but failed to send confirmation email.")
+    queue_email(db, user.email, subject, body)
+    await db.run_sync(bump_stats, users=1)
+    await db.run_sync(bump_versions, USERS)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Registered concurrently, after the check above.
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await db.refresh(new_user)
     return new_user
 
-@router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == form_data.username).first()
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+@router.post("/login", response_model=Token,
+             dependencies=[Depends(rate_limit("login", per_ip=RATE_LIMIT_LOGIN_PER_IP))])
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
+):
+    # The lookup runs on a reader; the writer (and the write lock) is only taken to store a rehash.
+    db_user = (await read_db.execute(
+        select(User.id, User.hashed_password).where(User.email == form_data.username)
+    )).first()
+    await read_db.rollback()
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await verify_and_update_password(form_data.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await db.execute(update(User).where(User.id == db_user.id).values(hashed_password=new_hash))
+        await db.commit()
 
     access_token = create_access_token(data={"sub": str(db_user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserOut)
-def read_current_user(current_user: User = Depends(get_current_user)):
+def read_current_user(current_user: UserSnapshot = Depends(get_current_user)):
     return current_user
 
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), current_user: UserSnapshot = Depends(get_current_user), db: Session = Depends(get_db)):
+    claims = decode_token(token)
+    if claims.get("jti"):
+        revoke_token(db, claims["jti"], current_user.id, claims["exp"])
+        db.commit()
+        token_denylist.add_token(claims["jti"], claims["exp"])
+    else:
+        # Tokens issued before jti was added cannot be revoked one by one.
+        cutoff = revoke_user_tokens(db, current_user.id)
+        db.commit()
+        token_denylist.add_cutoff(current_user.id, *cutoff)
+    return {"message": "Logged out successfully"}
@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from Auth.dependencies import admin_only
+from Auth.user_cache import UserSnapshot
+from Schemas.product import ProductCreate, ProductUpdate, BulkResult
+from Database.database import get_async_db
+from Utils.bulk import (
+    BulkFormatError, BulkReport, RowError, detect_format, iter_records, describe_validation_error,
+    insert_products, update_products
+)
+from Utils.catalog_cache import catalog_cache
+from Utils.idempotency import HashingStream, IdempotentRequest, idempotency_key
+from Utils import serialization
+from Config.config import BULK_BATCH_SIZE
+
+router = APIRouter()
+
+UploadFormat = Literal["csv", "ndjson"]
+
+def _upload_format(request: Request, format: Optional[str]) -> str:
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+    return fmt
+
+async def _write_batch(db: AsyncSession, batch: list, writer, report: BulkReport):
+    try:
+        result = await db.run_sync(writer, [row for _, row in batch])
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        message = f"Batch rejected by the database: {getattr(e, 'orig', None) or e}"
+        for line, _ in batch:
+            report.fail(line, message)
+        return None
+    report.batches += 1
+    return result
+
+async def _run_upload(stream, fmt: str, db: AsyncSession, parse_row, write_batch) -> dict:
+    report = BulkReport()
+    batch = []
+    try:
+        async for line, record in iter_records(stream, fmt):
+            report.rows += 1
+            if isinstance(record, str):
+                report.fail(line, record)
+                continue
+            try:
+                batch.append((line, parse_row(record)))
+            except ValidationError as e:
+                report.fail(line, describe_validation_error(e))
+                continue
+            except RowError as e:
+                report.fail(line, str(e))
+                continue
+            if len(batch) >= BULK_BATCH_SIZE:
+                await write_batch(db, batch, report)
+                batch = []
+        if batch:
+            await write_batch(db, batch, report)
+    except BulkFormatError as e:
+        # Batches already committed stay in place; the report says where reading stopped.
+        report.fail(report.rows + 1, str(e))
+    finally:
+        if report.batches:
+            catalog_cache.invalidate()
+    return report.summary()
+
+async def _run_idempotent_upload(request: Request, fmt: str, db: AsyncSession, idempotency: Optional[IdempotentRequest],
+                                 parse_row, write_batch):
+    if idempotency is None:
+        return await _run_upload(request.stream(), fmt, db, parse_row, write_batch)
+
+    # Batches commit as they go, so the key is reserved up front and the result stored at the end.
+    upload = HashingStream(request)
+    stored = await db.run_sync(idempotency.stored)
+    if stored is None:
+        try:
+            await db.run_sync(idempotency.reserve)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            stored = await db.run_sync(idempotency.stored)
+            if stored is None:
+                raise
+    if stored is not None:
+        # Read (without parsing) the upload, so a key reused for a different file is rejected.
+        return idempotency.check(stored, await upload.drain())
+
+    try:
+        summary = await _run_upload(upload, fmt, db, parse_row, write_batch)
+    except Exception:
+        await db.rollback()
+        await db.run_sync(idempotency.release)
+        await db.commit()
+        raise
+    body = serialization.dumps(BulkResult(**summary).model_dump(mode="json"))
+    response = await db.run_sync(idempotency.complete, body, upload.hexdigest())
+    await db.commit()
+    idempotency.committed()
+    return response
+
+def _parse_new_product(record: dict) -> dict:
+    return ProductCreate.model_validate(record).dict()
+
+def _parse_product_update(record: dict) -> dict:
+    try:
+        product_id = int(record["id"])
+    except KeyError:
+        raise RowError("id: Field required")
+    except (TypeError, ValueError):
+        raise RowError("id: Input should be a valid integer")
+    values = ProductUpdate.model_validate(record).dict(exclude_unset=True)
+    if not values:
+        raise RowError("No fields to update")
+    return dict(values, id=product_id)
+
+async def _insert_batch(db: AsyncSession, batch: list, report: BulkReport):
+    if await _write_batch(db, batch, insert_products, report) is not None:
+        report.written += len(batch)
+
+async def _update_batch(db: AsyncSession, batch: list, report: BulkReport):
+    missing = await _write_batch(db, batch, update_products, report)
+    if missing is None:
+        return
+    for line, row in batch:
+        if row["id"] in missing:
+            report.fail(line, f"Product {row['id']} not found")
+        else:
+            report.written += 1
+
+@router.post("/importProducts", response_model=BulkResult)
+async def import_products(
+    request: Request,
+    format: Optional[UploadFormat] = None,
+    db: AsyncSession = Depends(get_async_db),
+    _: UserSnapshot = Depends(admin_only),
+    idempotency: Optional[IdempotentRequest] = Depends(idempotency_key("importProducts", hash_body=False))
+):
+    fmt = _upload_format(request, format)
+    return await _run_idempotent_upload(request, fmt, db, idempotency, _parse_new_product, _insert_batch)
+
+@router.post("/bulkUpdateProducts", response_model=BulkResult)
+async def bulk_update_products(
+    request: Request,
+    format: Optional[UploadFormat] = None,
+    db: AsyncSession = Depends(get_async_db),
+    _: UserSnapshot = Depends(admin_only),
+    idempotency: Optional[IdempotentRequest] = Depends(idempotency_key("bulkUpdateProducts", hash_body=False))
+):
+    fmt = _upload_format(request, format)
+    return await _run_idempotent_upload(request, fmt, db, idempotency, _parse_product_update, _update_batch)
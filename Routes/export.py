@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from datetime import datetime
+from Auth.dependencies import admin_only
+from Auth.user_cache import UserSnapshot
+from Models.user import User
+from Models.order import Order
+from Utils.export import export_orders, export_users, MEDIA_TYPES
+
+router = APIRouter()
+
+ExportFormat = Literal["ndjson", "csv"]
+
+def _stream(chunks, fmt: str, name: str) -> StreamingResponse:
+    extension = "csv" if fmt == "csv" else "ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+@router.get("/exportOrders")
+def export_all_orders(
+    format: ExportFormat = "ndjson",
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    _: UserSnapshot = Depends(admin_only)
+):
+    filters = []
+    if status is not None:
+        filters.append(Order.status == status)
+    if user_id is not None:
+        filters.append(Order.user_id == user_id)
+    if created_from is not None:
+        filters.append(Order.created_at >= created_from)
+    if created_to is not None:
+        filters.append(Order.created_at < created_to)
+    return _stream(export_orders(format, filters), format, "orders")
+
+@router.get("/exportUsers")
+def export_all_users(
+    format: ExportFormat = "ndjson",
+    is_admin: Optional[bool] = None,
+    is_premium: Optional[bool] = None,
+    is_active: Optional[bool] = None,
+    _: UserSnapshot = Depends(admin_only)
+):
+    filters = []
+    if is_admin is not None:
+        filters.append(User.is_admin == is_admin)
+    if is_premium is not None:
+        filters.append(User.is_premium == is_premium)
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    return _stream(export_users(format, filters), format, "users")
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+@router.get("/live")
+def liveness():
+    return {"status": "alive"}
+
+@router.get("/ready")
+def readiness(request: Request):
+    report = request.app.state.startup.summary()
+    if not report["ready"]:
+        status = "starting" if report["total_ms"] is None else "stopping"
+        return JSONResponse(status_code=503, content={"status": status, **report}, headers={"Retry-After": "1"})
+    return {"status": "ready", **report}
@@ -1,66 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from Auth.dependencies import get_current_user
+from Auth.user_cache import UserSnapshot
 from Models.order import Order, OrderItem
 from Models.product import Product
-from Models.user import User
-from Schemas.order import OrderCreate, OrderOut
-from Database.database import get_db
-from Utils.email_sender import send_confirmation_email
+from Schemas.order import OrderCreate, OrderOut, OrderPage
+from Database.database import get_async_db, get_async_read_db
+from Utils.email_sender import queue_email
+from Utils.inventory import reserve_stock, release_stock, OutOfStock
+from Utils.pagination import keyset_filter, split_page
+from Utils import conditional, serialization
+from Utils.catalog_cache import catalog_cache
+from Utils.stats import bump_stats
+from Utils.analytics import record_order, record_order_removed
+from Utils.idempotency import IdempotentRequest, idempotency_key
+from Utils.rate_limit import rate_limit
+from Utils.versions import bump_order_versions, order_version_keys, user_orders
+from Config.config import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RATE_LIMIT_CREATE_ORDER_PER_IP, RATE_LIMIT_CREATE_ORDER_PER_USER
+)
+from typing import Optional
+from datetime import datetime
 
 router = APIRouter()
 
-@router.post("/createOrder", response_model=OrderOut)
-def create_order(order_data: OrderCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    total = 0.0
-    order = Order(user_id=current_user.id, total_amount=0.0, status="pending")
-    db.add(order)
-    db.commit()
-    db.refresh(order)
+@router.post("/createOrder", response_model=OrderOut, dependencies=[Depends(rate_limit(
+    "createOrder", per_ip=RATE_LIMIT_CREATE_ORDER_PER_IP, per_user=RATE_LIMIT_CREATE_ORDER_PER_USER
+))])
+async def create_order(
+    order_data: OrderCreate,
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    idempotency: Optional[IdempotentRequest] = Depends(idempotency_key("createOrder"))
+):
+    if idempotency is not None:
+        # A retry gets the first attempt's order back from a reader, before the writer is touched.
+        replay = await read_db.run_sync(idempotency.replay)
+        await read_db.rollback()
+        if replay is not None:
+            return replay
 
+    requested = {}
+    for item in order_data.items:
+        requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
+    result = await db.execute(select(Product).where(Product.id.in_(requested), Product.is_active == True))
+    products = {product.id: product for product in result.scalars()}
+
+    total = 0.0
+    order_items = []
     for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id, Product.is_active == True).first()
-        if not product or product.stock < item.quantity:
-            db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
-            db.delete(order)
-            db.commit()
+        product = products.get(item.product_id)
+        if not product or product.stock < requested[item.product_id]:
             raise HTTPException(status_code=400, detail=f"Product ID {item.product_id} is unavailable or out of stock")
         if product.is_premium and not current_user.is_premium:
-            db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
-            db.delete(order)
-            db.commit()
             raise HTTPException(
                 status_code=403,
                 detail=f"Product '{product.name}' is premium. Only premium users can purchase it."
             )
-        item_total = product.price * item.quantity
-        order_item = OrderItem(order_id=order.id, product_id=product.id, quantity=item.quantity, price=product.price)
-        db.add(order_item)
+        order_items.append({"product_id": product.id, "quantity": item.quantity, "price": product.price})
+        total += product.price * item.quantity
 
-        product.stock -= item.quantity
-        total += item_total
+    try:
+        levels = await db.run_sync(reserve_stock, requested, *order_version_keys(current_user.id))
+    except OutOfStock as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Product ID {e.product_ids[0]} is unavailable or out of stock")
+
+    order = Order(user_id=current_user.id, total_amount=total, status="pending", created_at=datetime.utcnow())
+    db.add(order)
+    await db.flush()
+
+    if order_items:
+        for order_item in order_items:
+            order_item["order_id"] = order.id
+        await db.execute(insert(OrderItem), order_items)
 
-    order.total_amount = total
-    db.commit()
-    db.refresh(order)
     subject = "Order Confirmation - MyShop"
     body = f"Hi {current_user.name},\n\nYour order #{order.id} has been placed successfully.\nTotal: ₹{order.total_amount:.2f}\n\nThank you for shopping with us!"
-    mail_res = send_confirmation_email(current_user.email, subject, body)
-    if not mail_res:
-        raise HTTPException(status_code=500, detail="Failed to send order confirmation email.")
+    queue_email(db, current_user.email, subject, body)
+    await db.run_sync(bump_stats, orders=1, revenue=total)
+    await db.run_sync(
+        record_order, order.created_at, total,
+        [(line["product_id"], line["quantity"], line["price"]) for line in order_items]
+    )
+    response = None
+    if idempotency is not None:
+        order_out = serialization.orders_with_items(
+            [(order.id, order.total_amount, order.status, order.created_at)],
+            [(order.id, line["product_id"], line["quantity"], line["price"]) for line in order_items]
+        )[0]
+        try:
+            response = await db.run_sync(idempotency.record, serialization.dumps(order_out))
+        except IntegrityError:
+            # A concurrent attempt with the same key committed first: drop this order and return that one.
+            await db.rollback()
+            replay = await read_db.run_sync(idempotency.replay)
+            if replay is None:
+                raise
+            return replay
+    await db.commit()
+    catalog_cache.apply_stock(levels)
+    if response is not None:
+        idempotency.committed()
+        return response
+    await db.refresh(order, ["items"])
     return order
 
-@router.get("/myOrders", response_model=list[OrderOut])
-def my_orders(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(Order).filter(Order.user_id == current_user.id).all()
+@router.get("/myOrders", response_model=OrderPage)
+async def my_orders(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    etag = await db.run_sync(
+        conditional.version_etag, (user_orders(current_user.id),), "myOrders", current_user.id, request.url.query
+    )
+    unchanged = conditional.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    stmt = select(*serialization.ORDER_COLUMNS).where(Order.user_id == current_user.id)
+    if status is not None:
+        stmt = stmt.where(Order.status == status)
+    if created_from is not None:
+        stmt = stmt.where(Order.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Order.created_at < created_to)
+
+    sort_key = [Order.created_at, Order.id]
+    result = await db.execute(keyset_filter(stmt, sort_key, cursor, limit, descending=True))
+    orders, next_cursor = split_page(result, sort_key, limit)
+    items = await db.execute(serialization.items_for([order.id for order in orders])) if orders else ()
+    body = serialization.page_body(serialization.orders_with_items(orders, items), next_cursor)
+    return conditional.respond(request, body, etag)
 
 @router.delete("/orders/{order_id}")
-def delete_own_order(
+async def delete_own_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
 
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -68,8 +157,13 @@ def delete_own_order(
     if order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You are not authorized to delete this order.")
 
-    db.query(OrderItem).filter(OrderItem.order_id == order_id).delete()
+    levels = await db.run_sync(release_stock, order)
+    await db.run_sync(record_order_removed, order)
+    await db.execute(delete(OrderItem).where(OrderItem.order_id == order_id))
 
-    db.delete(order)
-    db.commit()
+    await db.delete(order)
+    await db.run_sync(bump_stats, orders=-1, revenue=-order.total_amount)
+    await db.run_sync(bump_order_versions, current_user.id)
+    await db.commit()
+    catalog_cache.apply_stock(levels)
     return {"message": f"Order #{order_id} deleted successfully"}
@@ -1,24 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from Models.product import Product
-from Models.user import User
-from Schemas.product import ProductCreate, ProductOut
-from typing import List
+from Schemas.product import ProductCreate, ProductOut, ProductPage, ProductSearchPage
+from typing import List, Optional
 from Auth.dependencies import get_current_user, admin_only
-from Database.database import get_db
+from Auth.user_cache import UserSnapshot
+from Database.database import get_async_read_db
+from Utils.pagination import keyset_filter, split_page
+from Utils import conditional, serialization
+from Utils.catalog_cache import catalog_cache
+from Utils.search import search_products
+from Utils.versions import CATALOG, STOCK
+from Config.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CATALOG_CACHE_ENABLED, ETAG_ENABLED
 
 router = APIRouter()
 
-@router.get("/getProducts", response_model=List[ProductOut])
-def get_all_products(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@router.get("/getProducts", response_model=ProductPage)
+async def get_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    if current_user.is_premium or current_user.is_admin:
-        products = db.query(Product).filter(Product.is_active == True).all()
-    else:
-        products = db.query(Product).filter(Product.is_active == True, Product.is_premium == False).all()
+    if CATALOG_CACHE_ENABLED:
+        if catalog_cache.is_due():
+            await catalog_cache.refresh(db)
+        page = catalog_cache.page(catalog_cache.view_for(current_user), cursor, limit, min_price, max_price)
+        etag = page.etag if ETAG_ENABLED else None
+        return conditional.not_modified(request, etag) or conditional.respond(request, page.body, etag, page.encoded)
+
+    premium = current_user.is_premium or current_user.is_admin
+    etag = await db.run_sync(conditional.version_etag, (CATALOG, STOCK), "getProducts", premium, request.url.query)
+    unchanged = conditional.not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
 
-    return products
+    if premium:
+        stmt = select(*serialization.PRODUCT_COLUMNS).where(Product.is_active == True)
+    else:
+        stmt = select(*serialization.PRODUCT_COLUMNS).where(Product.is_active == True, Product.is_premium == False)
+    if min_price is not None:
+        stmt = stmt.where(Product.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Product.price <= max_price)
 
+    result = await db.execute(keyset_filter(stmt, [Product.id], cursor, limit))
+    products, next_cursor = split_page(result, [Product.id], limit)
+    body = serialization.page_body(serialization.rows_as_dicts(products, serialization.PRODUCT_FIELDS), next_cursor)
+    return conditional.respond(request, body, etag)
 
+@router.get("/search", response_model=ProductSearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=10000),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    facets: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    return await db.run_sync(
+        search_products, q, current_user.is_premium or current_user.is_admin, limit, offset,
+        min_price=min_price, max_price=max_price, in_stock=in_stock, facets=facets
+    )
@@ -1,7 +1,32 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
 
 class AdminStats(BaseModel):
     total_users: int
     total_orders: int
     total_products: int
-    total_revenue: float
\ No newline at end of file
+    total_revenue: float
+
+class ProfilerSettings(BaseModel):
+    enabled: bool
+    routes: List[str] = []
+    sample_rate: float = Field(1.0, gt=0, le=1)
+    interval_ms: Optional[float] = Field(None, ge=1, le=1000)
+
+class ProfilerStatus(BaseModel):
+    enabled: bool
+    routes: List[str]
+    sample_rate: float
+    interval_ms: float
+    buffer_size: int
+    captured: int
+
+class ProfileSummary(BaseModel):
+    id: int
+    method: str
+    route: str
+    started_at: datetime
+    duration_ms: float
+    status: int
+    samples: int
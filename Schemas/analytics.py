@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+class SalesBucketOut(BaseModel):
+    bucket_start: datetime
+    order_count: int
+    revenue: float
+    units: int
+    completed_count: int
+    completed_revenue: float
+
+    class Config:
+        orm_mode = True
+
+class ProductSalesOut(BaseModel):
+    product_id: int
+    order_count: int
+    units: int
+    revenue: float
@@ -1,13 +1,14 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    # Positive, so the conditional decrement in reserve_stock can only ever take stock.
+    quantity: int = Field(gt=0)
 
 class OrderCreate(BaseModel):
-    items: List[OrderItemCreate]
+    items: List[OrderItemCreate] = Field(min_length=1)
 
 class OrderItemOut(BaseModel):
     product_id: int
@@ -26,3 +27,7 @@ class OrderOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class OrderPage(BaseModel):
+    items: List[OrderOut]
+    next_cursor: Optional[str] = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ProductCreate(BaseModel):
     name: str
@@ -24,3 +24,44 @@ class ProductUpdate(BaseModel):
     stock: Optional[int] = None
     is_active: Optional[bool] = None
     is_premium: Optional[bool] = None
+
+class StockLevelsOut(BaseModel):
+    product_id: int
+    available: int
+    reserved: int
+    committed: int
+
+class ProductPage(BaseModel):
+    items: List[ProductOut]
+    next_cursor: Optional[str] = None
+
+class BulkRowError(BaseModel):
+    line: int
+    error: str
+
+class BulkResult(BaseModel):
+    rows: int
+    written: int
+    failed: int
+    batches: int
+    elapsed_ms: float
+    rows_per_second: Optional[float] = None
+    errors: List[BulkRowError]
+    errors_truncated: bool
+
+class PriceFacet(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int
+    in_stock: int
+    premium: int
+    price_ranges: List[PriceFacet]
+    truncated: bool = False
+
+class ProductSearchPage(BaseModel):
+    items: List[ProductOut]
+    next_offset: Optional[int] = None
+    facets: Optional[SearchFacets] = None
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     name: str
@@ -33,3 +34,6 @@ class UpdatePremiumStatus(BaseModel):
 class UpdateAdminStatus(BaseModel):
     is_admin: bool
 
+class UserPage(BaseModel):
+    items: List[UserOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,197 @@
+"""Pre-aggregated sales rollups behind the /admin/analytics endpoints.
+
+Every order is folded into one sales_rollup row and one product_sales_rollup
+row per product for each granularity (hour, day, month) of its created_at,
+inside the same transaction that creates, completes or deletes it. Reads
+are then a primary-key range scan over a handful of buckets, whatever the
+size of the orders table. Rebuild from scratch with:
+
+    python -m Utils.analytics rebuild
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+from Database.upsert import upsert_increment_rows
+from Models.analytics import SalesRollup, ProductSalesRollup
+from Models.order import Order, OrderItem
+
+GRANULARITIES = ("hour", "day", "month")
+COMPLETED_STATUS = "completed"
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "month":
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity {granularity!r}")
+
+
+def _aggregate_lines(lines):
+    per_product = defaultdict(lambda: [0, 0.0])
+    for product_id, quantity, price in lines:
+        per_product[product_id][0] += quantity
+        per_product[product_id][1] += quantity * price
+    return per_product
+
+
+def record_order(db: Session, created_at: datetime, total: float, lines, sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) an order given as (product_id, quantity, price) lines.
+
+    Two statements whatever the cart size: one executemany upsert per rollup table.
+    """
+    per_product = _aggregate_lines(lines)
+    units = sum(quantity for quantity, _ in per_product.values())
+    buckets = [(granularity, bucket_start(created_at, granularity)) for granularity in GRANULARITIES]
+    upsert_increment_rows(db, SalesRollup.__table__, ("granularity", "bucket_start"), [
+        {"granularity": granularity, "bucket_start": bucket,
+         "order_count": sign, "revenue": sign * total, "units": sign * units}
+        for granularity, bucket in buckets
+    ])
+    upsert_increment_rows(db, ProductSalesRollup.__table__, ("granularity", "bucket_start", "product_id"), [
+        {"granularity": granularity, "bucket_start": bucket, "product_id": product_id,
+         "order_count": sign, "units": sign * quantity, "revenue": sign * revenue}
+        for granularity, bucket in buckets
+        for product_id, (quantity, revenue) in per_product.items()
+    ])
+
+
+def record_completion(db: Session, created_at: datetime, total: float, sign: int = 1) -> None:
+    upsert_increment_rows(db, SalesRollup.__table__, ("granularity", "bucket_start"), [
+        {"granularity": granularity, "bucket_start": bucket_start(created_at, granularity),
+         "completed_count": sign, "completed_revenue": sign * total}
+        for granularity in GRANULARITIES
+    ])
+
+
+def record_order_removed(db: Session, order: Order) -> None:
+    """Take a persisted order (and its completion, if any) back out of the rollups. Call before its items are deleted."""
+    lines = (
+        db.query(OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+        .filter(OrderItem.order_id == order.id)
+        .all()
+    )
+    record_order(db, order.created_at, order.total_amount, lines, sign=-1)
+    if order.status == COMPLETED_STATUS:
+        record_completion(db, order.created_at, order.total_amount, sign=-1)
+
+
+def sales_buckets(db: Session, granularity: str, start: datetime, end: datetime):
+    return (
+        db.query(SalesRollup)
+        .filter(
+            SalesRollup.granularity == granularity,
+            SalesRollup.bucket_start >= bucket_start(start, granularity),
+            SalesRollup.bucket_start < end,
+        )
+        .order_by(SalesRollup.bucket_start)
+        .all()
+    )
+
+
+def top_products(db: Session, granularity: str, start: datetime, end: datetime, limit: int):
+    revenue = func.sum(ProductSalesRollup.revenue).label("revenue")
+    rows = (
+        db.query(
+            ProductSalesRollup.product_id,
+            func.sum(ProductSalesRollup.order_count).label("order_count"),
+            func.sum(ProductSalesRollup.units).label("units"),
+            revenue,
+        )
+        .filter(
+            ProductSalesRollup.granularity == granularity,
+            ProductSalesRollup.bucket_start >= bucket_start(start, granularity),
+            ProductSalesRollup.bucket_start < end,
+        )
+        .group_by(ProductSalesRollup.product_id)
+        .order_by(revenue.desc())
+        .limit(limit)
+        .all()
+    )
+    return [row._asdict() for row in rows]
+
+
+def rebuild_rollups(db: Session, batch_size: int = 10_000) -> int:
+    """Recompute both rollup tables from orders and order_items. Returns the number of orders folded in."""
+    sales = defaultdict(lambda: [0, 0.0, 0, 0, 0.0])
+    products = defaultdict(lambda: [0, 0, 0.0])
+
+    rows = (
+        db.query(Order.id, Order.created_at, Order.total_amount, Order.status,
+                 OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id)
+        .yield_per(batch_size)
+    )
+    last_order_id = None
+    orders = 0
+    for order_id, created_at, total, status, product_id, quantity, price in rows:
+        if created_at is None:
+            continue
+        buckets = [(granularity, bucket_start(created_at, granularity)) for granularity in GRANULARITIES]
+        if order_id != last_order_id:
+            last_order_id = order_id
+            orders += 1
+            for key in buckets:
+                entry = sales[key]
+                entry[0] += 1
+                entry[1] += total
+                if status == COMPLETED_STATUS:
+                    entry[3] += 1
+                    entry[4] += total
+            seen_products = set()
+        if product_id is None:
+            continue
+        for key in buckets:
+            sales[key][2] += quantity
+            entry = products[key + (product_id,)]
+            if product_id not in seen_products:
+                entry[0] += 1
+            entry[1] += quantity
+            entry[2] += quantity * price
+        seen_products.add(product_id)
+
+    db.execute(delete(SalesRollup))
+    db.execute(delete(ProductSalesRollup))
+    if sales:
+        db.execute(SalesRollup.__table__.insert(), [
+            {"granularity": granularity, "bucket_start": bucket, "order_count": count, "revenue": revenue,
+             "units": units, "completed_count": completed, "completed_revenue": completed_revenue}
+            for (granularity, bucket), (count, revenue, units, completed, completed_revenue) in sales.items()
+        ])
+    if products:
+        db.execute(ProductSalesRollup.__table__.insert(), [
+            {"granularity": granularity, "bucket_start": bucket, "product_id": product_id,
+             "order_count": count, "units": units, "revenue": revenue}
+            for (granularity, bucket, product_id), (count, units, revenue) in products.items()
+        ])
+    db.commit()
+    return orders
+
+
+def ensure_rollups(db: Session) -> None:
+    """Build the rollups once for a database that has orders but has never been rolled up."""
+    if db.query(SalesRollup.granularity).first() is None and db.query(Order.id).first() is not None:
+        rebuild_rollups(db)
+
+
+def main(argv):
+    from Database.database import Base, engine, SessionLocal
+    import Models.user, Models.product  # noqa: F401  (targets of Order/OrderItem relationships)
+
+    if argv[1:] != ["rebuild"]:
+        raise SystemExit("usage: python -m Utils.analytics rebuild")
+    Base.metadata.create_all(bind=engine, tables=[SalesRollup.__table__, ProductSalesRollup.__table__])
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt sales rollups from {rebuild_rollups(db)} orders.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,155 @@
+"""Incremental parsing and batched writes for the bulk product endpoints.
+
+Uploads are read from request.stream() one chunk at a time and turned into
+rows as they arrive, so memory stays bounded by one batch of rows plus the
+(capped) error report regardless of upload size. Two formats are accepted:
+
+- NDJSON: one JSON object per line.
+- CSV: a header line naming the fields, then one product per record. Quoted
+  fields may span lines.
+
+Each batch of BULK_BATCH_SIZE valid rows is written with one executemany
+statement and committed on its own, so a failing batch is rolled back and
+reported without undoing the batches before it.
+"""
+import csv
+import json
+import time
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from Config.config import BULK_MAX_ERRORS, BULK_MAX_LINE_BYTES
+from Models.product import Product
+from Utils.stats import bump_stats
+from Utils.versions import bump_version, CATALOG
+from Utils.search import index_products
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+class RowError(ValueError):
+    """A record that is well-formed but cannot be applied; reported against its line."""
+
+
+def detect_format(content_type: str):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return CSV
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return NDJSON
+    return None
+
+
+async def iter_lines(stream):
+    """Yield (line_number, text) for each line of an async byte stream without buffering the whole body."""
+    buffer = b""
+    line_number = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip(b"\r").decode("utf-8", errors="replace")
+        if len(buffer) > BULK_MAX_LINE_BYTES:
+            raise BulkFormatError(f"Line {line_number + 1} is longer than {BULK_MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield line_number + 1, buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+async def iter_records(stream, fmt: str):
+    """Yield (line_number, dict or error message) for each record of the upload."""
+    if fmt == NDJSON:
+        async for line_number, line in iter_lines(stream):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"Invalid JSON: {e}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Each line must be a JSON object"
+        return
+
+    header = None
+    pending = None
+    start_line = None
+    async for line_number, line in iter_lines(stream):
+        # A record continues onto the next line while it has an unterminated quoted field.
+        pending = line if pending is None else pending + "\n" + line
+        start_line = start_line or line_number
+        if pending.count('"') % 2:
+            continue
+        text, record_line, pending, start_line = pending, start_line, None, None
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lstrip("\ufeff") for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_line, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        # Empty cells mean "not provided", so optional fields fall back to their defaults.
+        yield record_line, {name: value for name, value in zip(header, values) if value != ""}
+    if pending is not None:
+        yield start_line, "Unterminated quoted field"
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors())
+
+
+class BulkReport:
+    def __init__(self):
+        self.rows = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        self._start = time.perf_counter()
+
+    def fail(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self._start
+        return {
+            "rows": self.rows,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def insert_products(db: Session, rows: list) -> int:
+    product_ids = db.execute(insert(Product).returning(Product.id), rows).scalars().all()
+    index_products(db, product_ids)
+    bump_stats(db, products=len(rows))
+    bump_version(db, CATALOG)
+    return len(rows)
+
+
+def update_products(db: Session, rows: list) -> set:
+    """Apply partial updates keyed by id; returns the ids that do not exist (those rows are skipped)."""
+    ids = [row["id"] for row in rows]
+    existing = set(db.execute(select(Product.id).where(Product.id.in_(ids))).scalars())
+    missing = set(ids) - existing
+    found = [row for row in rows if row["id"] in existing]
+    if found:
+        # ORM bulk UPDATE by primary key: rows with the same set of columns share one executemany.
+        db.execute(update(Product), found)
+        index_products(db, [row["id"] for row in found if "name" in row or "description" in row])
+        bump_version(db, CATALOG)
+    return missing
+
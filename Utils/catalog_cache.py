@@ -0,0 +1,235 @@
+"""In-process cache of the active catalog served by /products/getProducts.
+
+Two views are kept: "premium" (every active product, for premium users and
+admins) and "standard" (active, non-premium products). Each product is
+serialized to JSON once and its bytes are shared by both views, so a page is
+assembled by joining pre-built fragments without touching the database.
+
+Staleness across workers is detected through the "catalog" data version:
+admin writes bump it in their transaction and patch the local cache in place,
+while every other worker compares its loaded version with the database at
+most once per CATALOG_VERSION_CHECK_INTERVAL and reloads when it moved.
+Stock changes from checkouts are patched locally and re-synced from the
+database every CATALOG_STOCK_SYNC_INTERVAL. Async routes go through
+refresh(), which lets one request per event loop do the reload while the
+others wait for it: run_sync keeps the I/O on the loop's thread, where the
+reentrant lock excludes nothing.
+
+Each assembled page is kept with the hash of its bytes as its ETag and the
+compressed bodies Utils.conditional builds for it, so a poll of an
+unchanged page is answered without rebuilding or recompressing anything.
+"""
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from Config.config import CATALOG_VERSION_CHECK_INTERVAL, CATALOG_STOCK_SYNC_INTERVAL, CATALOG_PAGE_CACHE_SIZE
+from Models.product import Product
+from Schemas.product import ProductOut
+from Utils.pagination import encode_cursor, decode_cursor
+from Utils.conditional import body_etag
+from Utils.serialization import PRODUCT_COLUMNS
+from Utils.versions import CATALOG, get_version
+
+PREMIUM = "premium"
+STANDARD = "standard"
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+    encoded: dict
+
+
+class _CachedProduct:
+    __slots__ = ("id", "price", "stock", "is_premium", "body", "row")
+
+    def __init__(self, product):
+        self.id = product.id
+        self.price = product.price
+        self.stock = product.stock
+        self.is_premium = bool(product.is_premium)
+        self.row = ProductOut.model_validate(product, from_attributes=True)
+        self.body = self.row.model_dump_json().encode()
+
+    def with_stock(self, stock: int):
+        self.row = self.row.model_copy(update={"stock": stock})
+        self.stock = stock
+        self.body = self.row.model_dump_json().encode()
+
+
+class CatalogCache:
+    def __init__(self, version_check_interval: float = CATALOG_VERSION_CHECK_INTERVAL,
+                 stock_sync_interval: float = CATALOG_STOCK_SYNC_INTERVAL,
+                 page_cache_size: int = CATALOG_PAGE_CACHE_SIZE):
+        self.version_check_interval = version_check_interval
+        self.stock_sync_interval = stock_sync_interval
+        self.page_cache_size = page_cache_size
+        self._lock = threading.RLock()
+        self._refresh_loop = None
+        self._refresh_lock = None
+        self._products = {}
+        self._ids = {PREMIUM: [], STANDARD: []}
+        self._pages = OrderedDict()
+        self.version = None
+        self._checked_at = 0.0
+        self._stock_synced_at = 0.0
+
+    @staticmethod
+    def view_for(user) -> str:
+        return PREMIUM if user.is_premium or user.is_admin else STANDARD
+
+    def is_due(self) -> bool:
+        """True when the next read must consult the database (first load, version check or stock sync)."""
+        if self.version is None:
+            return True
+        now = time.monotonic()
+        return (now - self._checked_at >= self.version_check_interval
+                or now - self._stock_synced_at >= self.stock_sync_interval)
+
+    def ensure_fresh(self, db: Session) -> None:
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.version_check_interval:
+            if now - self._stock_synced_at >= self.stock_sync_interval:
+                self._sync_stock(db)
+            return
+        with self._lock:
+            if self.version is not None and time.monotonic() - self._checked_at < self.version_check_interval:
+                return
+            current = get_version(db, CATALOG)
+            if current != self.version:
+                self._load(db, current)
+            self._checked_at = time.monotonic()
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """ensure_fresh for the async routes, run by one request at a time on this event loop."""
+        loop = asyncio.get_running_loop()
+        if self._refresh_loop is not loop:
+            self._refresh_loop, self._refresh_lock = loop, asyncio.Lock()
+        async with self._refresh_lock:
+            # Whoever held the lock has usually done the work already.
+            if self.is_due():
+                await db.run_sync(self.ensure_fresh)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version = None
+
+    def _load(self, db: Session, version: int) -> None:
+        # Plain rows, so the caller's session is left without thousands of tracked entities.
+        products = db.execute(select(*PRODUCT_COLUMNS).where(Product.is_active == True).order_by(Product.id)).all()
+        cached = {product.id: _CachedProduct(product) for product in products}
+        self._products = cached
+        self._ids = {
+            PREMIUM: list(cached),
+            STANDARD: [product_id for product_id, product in cached.items() if not product.is_premium],
+        }
+        self._pages.clear()
+        self.version = version
+        self._stock_synced_at = time.monotonic()
+
+    def _sync_stock(self, db: Session) -> None:
+        with self._lock:
+            if time.monotonic() - self._stock_synced_at < self.stock_sync_interval:
+                return
+            self._stock_synced_at = time.monotonic()
+        levels = db.query(Product.id, Product.stock).filter(Product.is_active == True).all()
+        with self._lock:
+            self._apply_stock(dict(levels))
+
+    def _apply_stock(self, levels: dict) -> None:
+        changed = False
+        for product_id, stock in levels.items():
+            product = self._products.get(product_id)
+            if product is not None and product.stock != stock:
+                product.with_stock(stock)
+                changed = True
+        if changed:
+            self._pages.clear()
+
+    def apply_stock(self, levels: dict) -> None:
+        """Patch stock levels returned by Utils.inventory after a committed checkout or cancellation."""
+        if not levels:
+            return
+        with self._lock:
+            self._apply_stock(levels)
+
+    def apply_product(self, product, version: int) -> None:
+        """Write-through for an admin insert/update committed at catalog `version`."""
+        with self._lock:
+            if self.version is None or version != self.version + 1:
+                # Another worker changed the catalog in between; reload on the next read.
+                self.version = None
+                return
+            self._remove(product.id)
+            if product.is_active:
+                cached = _CachedProduct(product)
+                self._products[product.id] = cached
+                self._insert(PREMIUM, product.id)
+                if not cached.is_premium:
+                    self._insert(STANDARD, product.id)
+            self._pages.clear()
+            self.version = version
+
+    def remove_product(self, product_id: int, version: int) -> None:
+        with self._lock:
+            if self.version is None or version != self.version + 1:
+                self.version = None
+                return
+            self._remove(product_id)
+            self._pages.clear()
+            self.version = version
+
+    def _insert(self, view: str, product_id: int) -> None:
+        ids = self._ids[view]
+        ids.insert(bisect_right(ids, product_id), product_id)
+
+    def _remove(self, product_id: int) -> None:
+        if self._products.pop(product_id, None) is None:
+            return
+        for ids in self._ids.values():
+            index = bisect_right(ids, product_id) - 1
+            if index >= 0 and ids[index] == product_id:
+                del ids[index]
+
+    def page(self, view: str, cursor, limit: int, min_price=None, max_price=None) -> CachedPage:
+        key = (view, cursor, limit, min_price, max_price)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+
+            ids = self._ids[view]
+            start = bisect_right(ids, decode_cursor(cursor, [Product.id])[0]) if cursor else 0
+            fragments = []
+            last_id = None
+            more = False
+            for index in range(start, len(ids)):
+                product = self._products[ids[index]]
+                if min_price is not None and product.price < min_price:
+                    continue
+                if max_price is not None and product.price > max_price:
+                    continue
+                if len(fragments) == limit:
+                    more = True
+                    break
+                fragments.append(product.body)
+                last_id = product.id
+
+            next_cursor = json.dumps(encode_cursor([last_id])).encode() if more else b"null"
+            body = b'{"items":[' + b",".join(fragments) + b'],"next_cursor":' + next_cursor + b"}"
+
+            page = self._pages[key] = CachedPage(body, body_etag(body), {})
+            if len(self._pages) > self.page_cache_size:
+                self._pages.popitem(last=False)
+            return page
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,124 @@
+"""Conditional GET and compressed bodies for the polled list endpoints.
+
+Every list page carries a strong ETag. Pages read from the database take
+theirs from the data versions (Utils.versions) of what they show plus the
+route, the caller's view and the query string, so an If-None-Match that
+still matches is answered 304 after one primary-key read, before any row is
+queried or serialized. Catalog pages served from Utils.catalog_cache hash
+their bytes once when the page is built and need no query at all.
+
+Bodies of at least COMPRESSION_MIN_SIZE bytes are compressed with the best
+encoding the client accepts: brotli when the optional brotli package is
+installed, then gzip. A compressed body is a different representation, so
+its ETag gets the encoding as a suffix ("<tag>-gzip"); If-None-Match
+matches any encoding of the same tag. Callers that keep a page around pass
+a dict in which the compressed bodies are kept next to it.
+"""
+import gzip
+import hashlib
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from Config.config import (
+    ETAG_ENABLED, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+)
+from Utils import serialization
+from Utils.versions import get_versions
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+# Every page is user specific and must be revalidated, which is what turns a poll into a 304.
+CACHE_CONTROL = "private, no-cache"
+# The response shapes are part of every tag, so a deploy that changes them never matches old ones.
+_SHAPES = (serialization.PRODUCT_FIELDS, serialization.USER_FIELDS, serialization.ORDER_FIELDS,
+           serialization.ITEM_FIELDS)
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.blake2b(repr((_SHAPES, parts)).encode(), digest_size=16).hexdigest() + '"'
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def version_etag(db: Session, keys, *parts) -> Optional[str]:
+    """The ETag of a page built from the data versions `keys`, or None when ETags are off."""
+    if not ETAG_ENABLED:
+        return None
+    return make_etag(get_versions(db, keys), *parts)
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 when the request's If-None-Match matches `etag`, otherwise None."""
+    header = request.headers.get("if-none-match")
+    if etag is None or not header:
+        return None
+    if header.strip() == "*":
+        matched = etag
+    else:
+        opaque = etag.strip('"')
+        for candidate in header.split(","):
+            candidate = candidate.strip().removeprefix("W/").strip('"')
+            if candidate.partition("-")[0] == opaque:
+                # Echo the client's tag: it names the encoding of the copy the client holds.
+                matched = f'"{candidate}"'
+                break
+        else:
+            return None
+    return Response(status_code=304, headers={"ETag": matched, "Cache-Control": CACHE_CONTROL,
+                                              "Vary": "Accept-Encoding"})
+
+
+def accepted_encoding(request: Request) -> Optional[str]:
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return None
+    weights = {}
+    for part in header.lower().split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    for encoding in ENCODINGS:
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 keeps the bytes identical across workers, as a strong ETag requires.
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def respond(request: Request, body: bytes, etag: Optional[str] = None, encoded: Optional[dict] = None) -> Response:
+    """A JSON response for `body`, compressed when negotiated; `encoded` caches compressed bodies by encoding."""
+    headers = {}
+    encoding = None
+    if COMPRESSION_ENABLED and len(body) >= COMPRESSION_MIN_SIZE:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = accepted_encoding(request)
+    if encoding is not None:
+        compressed = encoded.get(encoding) if encoded is not None else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if encoded is not None:
+                encoded[encoding] = compressed
+        body = compressed
+        headers["Content-Encoding"] = encoding
+    if etag is not None:
+        headers["ETag"] = etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+        headers["Cache-Control"] = CACHE_CONTROL
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,19 +1,192 @@
 import smtplib
+import threading
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
-from Config.config import SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from Config.config import (
+    SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD,
+    EMAIL_BATCH_SIZE, EMAIL_POLL_INTERVAL, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_SECONDS
+)
+from Database.database import SessionLocal, ReadSessionLocal
+from Models.outbox import EmailOutbox
+from Utils.metrics import timed
 
-def send_confirmation_email(to_email: str, subject: str, body: str):
+SEND_LEASE = timedelta(minutes=5)
+
+def _build_message(to_email: str, subject: str, body: str) -> MIMEText:
     msg = MIMEText(body)
     msg['Subject'] = subject
     msg['From'] = EMAIL_ADDRESS
     msg['To'] = to_email
+    return msg
 
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
+def _is_connection_error(error: Exception) -> bool:
+    # SMTPException subclasses OSError, so rejections of a single message must be told apart from socket failures.
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError)):
         return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def queue_email(db: Session, to_email: str, subject: str, body: str) -> EmailOutbox:
+    """Stage an email in the outbox as part of the caller's transaction.
+
+    Nothing is sent here: the row becomes visible to the dispatcher only once
+    the caller commits, so a rolled back request never emails anyone.
+    """
+    message = EmailOutbox(to_email=to_email, subject=subject, body=body)
+    db.add(message)
+    return message
+
+
+class EmailDispatcher:
+    """Background worker draining the email outbox over one reused SMTP connection."""
+
+    def __init__(self, session_factory=SessionLocal, read_session_factory=ReadSessionLocal,
+                 batch_size: int = EMAIL_BATCH_SIZE, poll_interval: float = EMAIL_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._server = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.dispatch_batch()
+            except Exception as e:
+                print(f"Email dispatcher error: {e}")
+                sent = 0
+            # Keep draining while there is a backlog, otherwise wait for new rows.
+            if sent < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def _connect(self):
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            self._close()
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        server.starttls()
+        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        self._server = server
+        return server
+
+    def _close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+    def _claim_batch(self) -> list:
+        now = datetime.utcnow()
+        # A "sending" row whose lease ran out belongs to a worker that died mid-batch.
+        due = and_(
+            EmailOutbox.status.in_(("pending", "sending")),
+            EmailOutbox.next_attempt_at <= now
+        )
+        # Polls of an empty outbox stay on a reader: the writer connection and lock are only taken to claim rows.
+        read_db = self.read_session_factory()
+        try:
+            candidates = (
+                read_db.query(EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject, EmailOutbox.body)
+                .filter(due)
+                .order_by(EmailOutbox.id)
+                .limit(self.batch_size)
+                .all()
+            )
+        finally:
+            read_db.close()
+        if not candidates:
+            return []
+
+        # Conditional claim so concurrent dispatchers (one per worker) never send a row twice.
+        claimed = []
+        db = self.session_factory()
+        try:
+            for message in candidates:
+                updated = (
+                    db.query(EmailOutbox)
+                    .filter(EmailOutbox.id == message.id, due)
+                    .update(
+                        {EmailOutbox.status: "sending", EmailOutbox.next_attempt_at: now + SEND_LEASE},
+                        synchronize_session=False
+                    )
+                )
+                if updated:
+                    claimed.append(message)
+            db.commit()
+        finally:
+            db.close()
+        return claimed
+
+    def dispatch_batch(self) -> int:
+        # No database connection is held while talking to the SMTP server.
+        messages = self._claim_batch()
+        if not messages:
+            return 0
+
+        errors = {}
+        connection_error = None
+        for message in messages:
+            if connection_error is not None:
+                # The server is unreachable; back off the rest of the batch without reconnecting per row.
+                errors[message.id] = connection_error
+                continue
+            try:
+                with timed("email"):
+                    server = self._connect()
+                    server.send_message(_build_message(message.to_email, message.subject, message.body))
+            except Exception as e:
+                if _is_connection_error(e):
+                    self._close()
+                    connection_error = e
+                errors[message.id] = e
+
+        db = self.session_factory()
+        try:
+            for row in db.query(EmailOutbox).filter(EmailOutbox.id.in_([message.id for message in messages])):
+                if row.id in errors:
+                    self._schedule_retry(row, errors[row.id])
+                else:
+                    row.status = "sent"
+                    row.sent_at = datetime.utcnow()
+                    row.attempts = (row.attempts or 0) + 1
+            db.commit()
+        finally:
+            db.close()
+        return len(messages)
+
+    @staticmethod
+    def _schedule_retry(message: EmailOutbox, error: Exception):
+        message.attempts = (message.attempts or 0) + 1
+        message.last_error = str(error)[:500]
+        if message.attempts >= EMAIL_MAX_ATTEMPTS:
+            message.status = "failed"
+            return
+        delay = EMAIL_RETRY_BASE_SECONDS * (2 ** (message.attempts - 1))
+        message.status = "pending"
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+email_dispatcher = EmailDispatcher()
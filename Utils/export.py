@@ -0,0 +1,111 @@
+"""Streaming exports of orders and users for reporting jobs.
+
+Rows are read with yield_per, so only one batch of EXPORT_BATCH_SIZE plain
+column tuples is in memory at a time, and each batch is encoded and sent as
+one chunk before the next is fetched. Order items are loaded per batch of
+orders with a single IN query. The generators open their own read session
+because a StreamingResponse outlives the request's dependencies.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from Config.config import EXPORT_BATCH_SIZE
+from Database.database import ReadSessionLocal
+from Models.order import Order, OrderItem
+from Models.user import User
+
+NDJSON = "ndjson"
+CSV = "csv"
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+
+ORDER_COLUMNS = (Order.id, Order.user_id, Order.total_amount, Order.status, Order.created_at)
+ITEM_COLUMNS = (OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+USER_COLUMNS = (User.id, User.name, User.email, User.is_active, User.is_admin, User.is_premium, User.created_at)
+
+ORDER_CSV_HEADER = ("order_id", "user_id", "total_amount", "status", "created_at", "product_id", "quantity", "price")
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _json_value(value)
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        [_csv_value(value) for value in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def _partitions(stmt):
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield db, partition
+    finally:
+        db.close()
+
+
+def export_orders(fmt: str, filters=()):
+    """Yield encoded chunks of orders (with their items), oldest first."""
+    stmt = select(*ORDER_COLUMNS).where(*filters).order_by(Order.id)
+    if fmt == CSV:
+        yield _csv_chunk([ORDER_CSV_HEADER])
+
+    for db, orders in _partitions(stmt):
+        items = {}
+        for order_id, *item in db.execute(
+            select(OrderItem.order_id, *ITEM_COLUMNS)
+            .where(OrderItem.order_id.in_([order.id for order in orders]))
+            .order_by(OrderItem.order_id, OrderItem.id)
+        ):
+            items.setdefault(order_id, []).append(item)
+
+        if fmt == CSV:
+            # One line per item; an order without items keeps one line with empty item columns.
+            yield _csv_chunk(
+                tuple(order) + tuple(item)
+                for order in orders
+                for item in items.get(order.id, [(None, None, None)])
+            )
+            continue
+        yield "".join(
+            json.dumps({
+                "id": order.id,
+                "user_id": order.user_id,
+                "total_amount": order.total_amount,
+                "status": order.status,
+                "created_at": _json_value(order.created_at),
+                "items": [
+                    {"product_id": product_id, "quantity": quantity, "price": price}
+                    for product_id, quantity, price in items.get(order.id, ())
+                ],
+            }) + "\n"
+            for order in orders
+        ).encode()
+
+
+def export_users(fmt: str, filters=()):
+    """Yield encoded chunks of users (never their password hashes), in id order."""
+    stmt = select(*USER_COLUMNS).where(*filters).order_by(User.id)
+    names = [column.key for column in USER_COLUMNS]
+    if fmt == CSV:
+        yield _csv_chunk([names])
+
+    for _, users in _partitions(stmt):
+        if fmt == CSV:
+            yield _csv_chunk(users)
+            continue
+        yield "".join(
+            json.dumps({name: _json_value(value) for name, value in zip(names, user)}) + "\n"
+            for user in users
+        ).encode()
@@ -0,0 +1,255 @@
+"""Idempotency-Key support for retried mutations.
+
+A client that sends the same Idempotency-Key again (same user, same route)
+gets the stored response of the first successful attempt instead of having
+the work repeated. Keys are scoped per route and user, and a key reused
+with a different request (method, path, query and body) is rejected with
+422 rather than replayed.
+
+Responses live in the idempotency_keys table for IDEMPOTENCY_TTL_SECONDS,
+with a bounded in-process LRU in front of it so retries to the same worker
+never reach the database. Routes that finish in one transaction store the
+response in that transaction (IdempotentRequest.record), so an order and
+its stored response are committed together or not at all. A concurrent
+duplicate then fails on the unique (scope, key) constraint, rolls back and
+replays the winner's response. Those routes look the key up on a read
+session (IdempotentRequest.replay), so a retry is answered without taking
+the single writer connection; an expired record seen there is deleted by
+the transaction that stores the new response. Streaming uploads commit in
+batches, so they reserve the key first (a second attempt meanwhile gets
+409) and store the response when the upload finishes.
+
+Only successful responses are stored; a failed attempt can be retried with
+the same key.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from Auth.dependencies import get_current_user
+from Config.config import (
+    IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_PURGE_INTERVAL
+)
+from Models.idempotency import IdempotencyRecord
+
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: bytes
+    expires_at: datetime
+
+    def response(self) -> Response:
+        return Response(content=self.body, status_code=self.status_code, media_type="application/json",
+                        headers={REPLAY_HEADER: "true"})
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, cache_size: int = IDEMPOTENCY_CACHE_SIZE,
+                 lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS, purge_interval: float = IDEMPOTENCY_PURGE_INTERVAL):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lock = timedelta(seconds=lock_seconds)
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_at = time.monotonic()
+
+    def get(self, db: Session, scope: str, key: str) -> Optional[StoredResponse]:
+        """The stored response for (scope, key), or None; raises 409 while another attempt holds the key."""
+        stored, expired_id = self.lookup(db, scope, key)
+        if expired_id is not None:
+            self.free(db, expired_id)
+        return stored
+
+    def lookup(self, db: Session, scope: str, key: str):
+        """Read-only get(): (stored response or None, id of an expired record to free() or None)."""
+        now = datetime.utcnow()
+        with self._lock:
+            stored = self._cache.get((scope, key))
+            if stored is not None:
+                if stored.expires_at > now:
+                    self._cache.move_to_end((scope, key))
+                    return stored, None
+                del self._cache[(scope, key)]
+
+        record = db.execute(
+            select(IdempotencyRecord).where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+        ).scalar_one_or_none()
+        if record is None:
+            return None, None
+        if record.expires_at <= now:
+            # Expired (or a reservation left behind by a crashed worker): the key is free for this attempt.
+            return None, record.id
+        if record.status == IN_PROGRESS:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+        stored = StoredResponse(record.request_hash, record.response_status, record.response_body.encode(),
+                                record.expires_at)
+        self.remember(scope, key, stored)
+        return stored, None
+
+    def free(self, db: Session, record_id: int) -> None:
+        db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.id == record_id))
+
+    def add(self, db: Session, scope: str, key: str, request_hash: str, status_code: int, body: bytes) -> StoredResponse:
+        """Store a completed response in the caller's transaction; remember() it once that commits."""
+        stored = StoredResponse(request_hash, status_code, body, datetime.utcnow() + self.ttl)
+        self._purge_due(db)
+        db.execute(insert(IdempotencyRecord).values(
+            scope=scope, key=key, request_hash=request_hash, status=COMPLETED,
+            response_status=status_code, response_body=body.decode(), expires_at=stored.expires_at
+        ))
+        return stored
+
+    def reserve(self, db: Session, scope: str, key: str, request_hash: str) -> None:
+        self._purge_due(db)
+        db.execute(insert(IdempotencyRecord).values(
+            scope=scope, key=key, request_hash=request_hash, status=IN_PROGRESS,
+            expires_at=datetime.utcnow() + self.lock
+        ))
+
+    def complete(self, db: Session, scope: str, key: str, request_hash: str, status_code: int,
+                 body: bytes) -> StoredResponse:
+        stored = StoredResponse(request_hash, status_code, body, datetime.utcnow() + self.ttl)
+        db.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+            .values(request_hash=request_hash, status=COMPLETED, response_status=status_code,
+                    response_body=body.decode(), expires_at=stored.expires_at)
+        )
+        return stored
+
+    def release(self, db: Session, scope: str, key: str) -> None:
+        db.execute(delete(IdempotencyRecord).where(
+            IdempotencyRecord.scope == scope, IdempotencyRecord.key == key, IdempotencyRecord.status == IN_PROGRESS
+        ))
+
+    def remember(self, scope: str, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._cache[(scope, key)] = stored
+            self._cache.move_to_end((scope, key))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def purge_expired(self, db: Session) -> int:
+        return db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())).rowcount
+
+    def _purge_due(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            self.purge_expired(db)
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _fingerprint(request: Request, body: bytes = b""):
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.url.path.encode(), request.url.query.encode()):
+        digest.update(part + b"\0")
+    digest.update(body)
+    return digest
+
+
+class IdempotentRequest:
+    """One request's Idempotency-Key, scoped to its route and user."""
+
+    def __init__(self, store: IdempotencyStore, scope: str, key: str, request_hash: str):
+        self.store = store
+        self.scope = scope
+        self.key = key
+        self.request_hash = request_hash
+        self._stored = None
+        self._expired_id = None
+
+    def stored(self, db: Session) -> Optional[StoredResponse]:
+        return self.store.get(db, self.scope, self.key)
+
+    def check(self, stored: StoredResponse, request_hash: str = None) -> Response:
+        if stored.request_hash != (request_hash or self.request_hash):
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        return stored.response()
+
+    def replay(self, read_db: Session) -> Optional[Response]:
+        """The stored response to replay, looked up on a read session; None when this attempt should run."""
+        stored, self._expired_id = self.store.lookup(read_db, self.scope, self.key)
+        return self.check(stored) if stored is not None else None
+
+    def record(self, db: Session, body: bytes, status_code: int = 200) -> Response:
+        """Store `body` in the caller's transaction and return it as the response; call committed() after commit."""
+        if self._expired_id is not None:
+            self.store.free(db, self._expired_id)
+        self._stored = self.store.add(db, self.scope, self.key, self.request_hash, status_code, body)
+        return Response(content=body, status_code=status_code, media_type="application/json")
+
+    def reserve(self, db: Session) -> None:
+        self.store.reserve(db, self.scope, self.key, self.request_hash)
+
+    def complete(self, db: Session, body: bytes, request_hash: str, status_code: int = 200) -> Response:
+        """Turn this request's reservation into the stored response; call committed() after commit."""
+        self._stored = self.store.complete(db, self.scope, self.key, request_hash, status_code, body)
+        return Response(content=body, status_code=status_code, media_type="application/json")
+
+    def release(self, db: Session) -> None:
+        self.store.release(db, self.scope, self.key)
+
+    def committed(self) -> None:
+        if self._stored is not None:
+            self.store.remember(self.scope, self.key, self._stored)
+
+
+def idempotency_key(route: str, hash_body: bool = True):
+    """Dependency returning the request's IdempotentRequest, or None when no Idempotency-Key was sent.
+
+    Streaming routes pass hash_body=False and fold the upload into the hash themselves.
+    """
+    async def dependency(
+        request: Request,
+        key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
+        current_user=Depends(get_current_user)
+    ):
+        if key is None:
+            return None
+        body = await request.body() if hash_body else b""
+        return IdempotentRequest(idempotency_store, f"{route}:{current_user.id}", key,
+                                 _fingerprint(request, body).hexdigest())
+    return dependency
+
+
+class HashingStream:
+    """Wraps request.stream() and hashes the upload as it is read."""
+
+    def __init__(self, request: Request):
+        self._stream = request.stream()
+        self._digest = _fingerprint(request)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk = await self._stream.__anext__()
+        self._digest.update(chunk)
+        return chunk
+
+    async def drain(self) -> str:
+        async for _ in self:
+            pass
+        return self.hexdigest()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
@@ -0,0 +1,105 @@
+"""Stock reservation on top of Product.stock.
+
+Product.stock is the number of units still available to sell. Placing an
+order reserves units by decrementing stock with one conditional UPDATE, so
+concurrent checkouts can never oversell and no row is locked for longer than
+that single statement. The items of a pending order are the reservation;
+completing the order commits it, and deleting a pending order releases its
+units back to stock. Both bump the "stock" data version in the same
+transaction, which is what the catalog ETags are built from.
+"""
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+from Models.order import Order, OrderItem
+from Models.product import Product
+from Utils.versions import STOCK, bump_versions
+
+RESERVED_STATUS = "pending"
+COMMITTED_STATUS = "completed"
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for products {self.product_ids}")
+
+
+def reserve_stock(db: Session, quantities: dict, *version_keys: str) -> dict:
+    """Atomically take `quantities` ({product_id: positive units}) out of available stock.
+
+    Either every product is decremented or OutOfStock is raised; the caller
+    must roll back in that case since a partial decrement may have been applied.
+    The "stock" version is bumped together with any `version_keys` the caller
+    passes, in one upsert. Returns the new stock level per product when the
+    backend supports UPDATE ... RETURNING, otherwise an empty dict.
+    """
+    if not quantities:
+        bump_versions(db, *version_keys)
+        return {}
+    needed = case(quantities, value=Product.id)
+    stmt = (
+        update(Product)
+        .where(Product.id.in_(quantities), Product.is_active == True, Product.stock >= needed)
+        .values(stock=Product.stock - needed)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        levels = dict(db.execute(stmt.returning(Product.id, Product.stock)).all())
+        missing = set(quantities) - set(levels)
+    else:
+        levels = {}
+        missing = set(quantities) if db.execute(stmt).rowcount != len(quantities) else set()
+    if missing:
+        raise OutOfStock(missing)
+    bump_versions(db, STOCK, *version_keys)
+    return levels
+
+
+def release_stock(db: Session, order: Order) -> dict:
+    """Return the units reserved by a pending order to available stock.
+
+    Completed orders have already committed their units, so nothing is released
+    for them. Returns new stock levels like reserve_stock.
+    """
+    if order.status != RESERVED_STATUS:
+        return {}
+    quantities = dict(
+        db.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .filter(OrderItem.order_id == order.id)
+        .group_by(OrderItem.product_id)
+        .all()
+    )
+    if not quantities:
+        return {}
+    stmt = (
+        update(Product)
+        .where(Product.id.in_(quantities))
+        .values(stock=Product.stock + case(quantities, value=Product.id))
+        .execution_options(synchronize_session=False)
+    )
+    bump_versions(db, STOCK)
+    if db.get_bind().dialect.update_returning:
+        return dict(db.execute(stmt.returning(Product.id, Product.stock)).all())
+    db.execute(stmt)
+    return {}
+
+
+def stock_levels(db: Session, product_id: int):
+    """Available, reserved and committed units for one product, or None if it does not exist."""
+    available = db.query(Product.stock).filter(Product.id == product_id).scalar()
+    if available is None:
+        return None
+    rows = (
+        db.query(Order.status, func.coalesce(func.sum(OrderItem.quantity), 0))
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(OrderItem.product_id == product_id, Order.status.in_((RESERVED_STATUS, COMMITTED_STATUS)))
+        .group_by(Order.status)
+        .all()
+    )
+    totals = dict(rows)
+    return {
+        "product_id": product_id,
+        "available": available,
+        "reserved": totals.get(RESERVED_STATUS, 0),
+        "committed": totals.get(COMMITTED_STATUS, 0),
+    }
@@ -0,0 +1,207 @@
+"""Process-local request metrics, exposed in Prometheus text format on /metrics.
+
+MetricsMiddleware times every request and labels it with the route template
+(never the raw path, so /admin/users/{user_id} is one series). For the
+duration of a request a RequestTimings object lives in a context variable;
+the engine hooks installed by instrument_engines and the timed() blocks
+around authentication, bcrypt and email add to it, and the totals are
+returned to the client in a Server-Timing header:
+
+    Server-Timing: db;dur=3.1;desc="4 queries", auth;dur=0.4, hash;dur=0, email;dur=0, app;dur=7.9
+
+Every worker process keeps its own registry, so scrape each worker or
+aggregate on the Prometheus side.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("db", "auth", "hash", "email")
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum of observations.
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        bucket_names = label_names + ("le",)
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(bucket_names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(label_names, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(label_names, labels)} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status code.")
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route.")
+db_statements = Counter("db_statements_total", "SQL statements executed, by route.")
+db_latency = Histogram("db_statement_duration_seconds", "Time spent executing single SQL statements.")
+phase_latency = Histogram("phase_duration_seconds", "Time spent in authentication, bcrypt and email work.")
+
+_METRICS = (
+    (http_requests, ("method", "route", "status")),
+    (http_latency, ("method", "route")),
+    (db_statements, ("route",)),
+    (db_latency, ()),
+    (phase_latency, ("phase",)),
+)
+
+
+class RequestTimings:
+    """Accumulated per-request costs in seconds. Shared by reference, so threadpool copies of the context add to it."""
+    __slots__ = ("db", "queries", "auth", "hash", "email")
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.auth = 0.0
+        self.hash = 0.0
+        self.email = 0.0
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        parts.extend(f"{phase};dur={getattr(self, phase) * 1000:.1f}" for phase in PHASES[1:])
+        parts.append(f"app;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Charge the enclosed block to `phase` ("auth", "hash" or "email") for the current request, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_latency.observe((phase,), elapsed)
+        timings = _current.get()
+        if timings is not None:
+            setattr(timings, phase, getattr(timings, phase) + elapsed)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    db_latency.observe((), elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.db += elapsed
+        timings.queries += 1
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engines(engines) -> None:
+    for bind in engines:
+        if not event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+            event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+            event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+            event.listen(bind, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so the request runs in the caller's task and context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.server_timing(time.perf_counter() - start).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            http_requests.inc((scope["method"], template, status))
+            http_latency.observe((scope["method"], template), elapsed)
+            db_statements.inc((template,), timings.queries)
+
+
+def render() -> str:
+    lines = []
+    for metric, label_names in _METRICS:
+        lines.extend(metric.render(label_names))
+    return "\n".join(lines) + "\n"
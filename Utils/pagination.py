@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, tuple_
+
+
+def encode_cursor(values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _coerce(column, value):
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Integer):
+        return int(value)
+    return value
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query, columns, cursor, limit: int, descending: bool = False):
+    """Restrict `query` (a Query or a select()) to the page after `cursor`.
+
+    The cursor encodes the sort key of the last row, so every page is a range
+    scan starting after it instead of an OFFSET that re-reads skipped rows.
+    The last column must be unique (normally the primary key) to break ties.
+    One extra row is requested so split_page can tell whether more follow.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        bound = tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.filter(key < bound if descending else key > bound)
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    return query.limit(limit + 1)
+
+
+def split_page(rows, columns, limit: int):
+    """Trim the look-ahead row fetched by keyset_filter and build the next cursor."""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return rows, next_cursor
+
+
+def keyset_page(query, columns, cursor, limit: int, descending: bool = False):
+    """Return one page of `query` ordered by `columns` plus the cursor for the next page."""
+    rows = keyset_filter(query, columns, cursor, limit, descending).all()
+    return split_page(rows, columns, limit)
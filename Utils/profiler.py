@@ -0,0 +1,226 @@
+"""On-demand sampling profiler for selected routes.
+
+An admin turns it on for a set of route templates and a sample rate. Each
+matching request is then, with that probability, captured: while it runs, a
+background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval. Nothing is installed with
+sys.setprofile, so requests that are not captured pay only for a route match
+and a random() call.
+
+Captures are stored as collapsed stacks ("thread;frame;frame count"), which
+flamegraph.pl, speedscope and inferno read directly, in a ring buffer of the
+last PROFILER_BUFFER_SIZE captures. Only one request is captured at a time
+because the samples are process-wide. Threads parked in an idle wait
+(event loop select, empty thread pools) are left out, but concurrent requests
+can still show up in a capture.
+"""
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from starlette.routing import Match
+from Config.config import PROFILER_BUFFER_SIZE, PROFILER_INTERVAL_MS
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+# Thread pool loops whose own frame is the leaf only while they block on an empty work queue.
+_IDLE_LOOPS = {("thread.py", "_worker"), ("_asyncio.py", "run")}
+
+
+class Capture:
+    __slots__ = ("id", "method", "route", "started_at", "duration_ms", "status", "samples", "stacks", "_start")
+
+    def __init__(self, capture_id: int, method: str, route: str):
+        self.id = capture_id
+        self.method = method
+        self.route = route
+        self.started_at = datetime.utcnow()
+        self.duration_ms = None
+        self.status = None
+        self.samples = 0
+        self.stacks = {}
+        self._start = time.perf_counter()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "samples": self.samples,
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def _frame_label(frame) -> str:
+    path = frame.f_code.co_filename
+    if path.startswith(_APP_ROOT):
+        path = os.path.relpath(path, _APP_ROOT)
+    else:
+        path = os.path.basename(path)
+    return f"{frame.f_code.co_name} ({path}:{frame.f_lineno})".replace(";", ":").replace(" ", "_")
+
+
+def _is_idle(frames) -> bool:
+    leaf = frames[0].f_code
+    if any(frame.f_code.co_filename.startswith(_APP_ROOT) for frame in frames):
+        return False
+    return (leaf.co_filename.endswith(_IDLE_MODULES)
+            or (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LOOPS)
+
+
+def _collapse(thread_name: str, frame):
+    """Root-first collapsed stack, or None for a thread that is only waiting for work."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    if not frames or _is_idle(frames):
+        return None
+    return ";".join([thread_name.replace(" ", "_")] + [_frame_label(frame) for frame in reversed(frames)])
+
+
+class SamplingProfiler:
+    def __init__(self, capacity: int = PROFILER_BUFFER_SIZE, interval_ms: float = PROFILER_INTERVAL_MS):
+        self.enabled = False
+        self.routes = frozenset()
+        self.sample_rate = 0.0
+        self.interval = interval_ms / 1000
+        self._captures = deque(maxlen=capacity)
+        self._active = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ids = itertools.count(1)
+        self._thread = None
+
+    def configure(self, enabled: bool, routes=(), sample_rate: float = 1.0, interval_ms: float = None) -> dict:
+        with self._lock:
+            self.enabled = enabled
+            self.routes = frozenset(routes)
+            self.sample_rate = sample_rate
+            if interval_ms is not None:
+                self.interval = interval_ms / 1000
+            if enabled and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return self.settings()
+
+    def settings(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "routes": sorted(self.routes),
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "buffer_size": self._captures.maxlen,
+            "captured": len(self._captures),
+        }
+
+    def wants(self, route: str) -> bool:
+        return self.enabled and (not self.routes or route in self.routes) and random.random() < self.sample_rate
+
+    def begin(self, method: str, route: str):
+        with self._lock:
+            if self._active is not None:
+                return None
+            capture = self._active = Capture(next(self._ids), method, route)
+        self._wake.set()
+        return capture
+
+    def end(self, capture: Capture, status: int) -> None:
+        capture.duration_ms = round((time.perf_counter() - capture._start) * 1000, 3)
+        capture.status = status
+        with self._lock:
+            self._active = None
+            self._captures.append(capture)
+
+    def captures(self) -> list:
+        with self._lock:
+            return list(self._captures)
+
+    def get(self, capture_id: int):
+        with self._lock:
+            return next((capture for capture in self._captures if capture.id == capture_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._captures.clear()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while self.enabled:
+            capture = self._active
+            if capture is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                _collapse(names.get(ident, str(ident)), frame)
+                for ident, frame in sys._current_frames().items() if ident != own_ident
+            ]
+            # Samples are only added under the lock, so a capture is immutable once end() has stored it.
+            with self._lock:
+                if self._active is capture:
+                    for stack in stacks:
+                        if stack is not None:
+                            capture.stacks[stack] = capture.stacks.get(stack, 0) + 1
+                    capture.samples += 1
+            time.sleep(self.interval)
+
+
+def merged_collapsed(captures) -> str:
+    """Sum the stacks of several captures into one collapsed profile."""
+    totals = {}
+    for capture in captures:
+        for stack, count in capture.stacks.items():
+            totals[stack] = totals.get(stack, 0) + count
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware that captures the requests selected by `profiler`."""
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler or sampling_profiler
+
+    def _route_template(self, scope):
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", None)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+        route = self._route_template(scope)
+        capture = self.profiler.begin(scope["method"], route) if route and self.profiler.wants(route) else None
+        if capture is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.profiler.end(capture, status)
+
+
+sampling_profiler = SamplingProfiler()
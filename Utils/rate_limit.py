@@ -0,0 +1,214 @@
+"""Token-bucket rate limits and in-flight load shedding for the expensive routes.
+
+rate_limit(route, per_ip=..., per_user=...) returns a dependency that takes
+one token from the caller's bucket for that route, per client IP and/or per
+authenticated user, and answers 429 with Retry-After once a bucket is
+empty. A bucket holds up to <requests> tokens and refills continuously at
+<requests>/<seconds>, so short bursts pass and sustained floods are cut to
+the configured rate.
+
+Buckets live in one of two backends:
+
+- memory: a plain dict of key -> (tokens, updated) in least-recently-used
+  order, capped at RATE_LIMIT_MAX_KEYS. Evicting a bucket only forgets
+  tokens already spent, so a flood of one-off keys cannot grow memory.
+- sqlite: a small WAL-mode table in RATE_LIMIT_SQLITE_PATH shared by every
+  worker on the host. Each check is one INSERT ... ON CONFLICT DO UPDATE
+  that refills and spends atomically, run off the event loop.
+
+LoadShedMiddleware counts the requests a worker has in flight and answers
+503 with Retry-After instead of queueing once LOAD_SHED_MAX_IN_FLIGHT is
+reached; the expensive routes are shed earlier, at
+LOAD_SHED_EXPENSIVE_IN_FLIGHT, so cheap reads keep working under overload.
+"""
+import math
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from Auth.dependencies import get_current_user
+from Config.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_TRUST_FORWARDED,
+    LOAD_SHED_MAX_IN_FLIGHT, LOAD_SHED_EXPENSIVE_IN_FLIGHT
+)
+
+EXPENSIVE_PATHS = frozenset(("/auth/login", "/auth/register", "/orders/createOrder"))
+UNSHED_PATHS = frozenset(("/health/live", "/health/ready", "/metrics"))
+
+
+class Rate(NamedTuple):
+    capacity: float
+    per_second: float
+
+
+def parse_rate(value: str):
+    """"10/60" -> Rate(10, 1/6); an empty value means no limit (None)."""
+    if not value:
+        return None
+    requests, _, seconds = value.partition("/")
+    rate = Rate(float(requests), float(requests) / float(seconds or 1))
+    if rate.capacity <= 0 or rate.per_second <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}; expected <requests>/<seconds>")
+    return rate
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: Rate) -> float:
+        return self.take_now(key, rate, time.monotonic())
+
+    def take_now(self, key: str, rate: Rate, now: float) -> float:
+        """Spend one token; returns 0 when allowed, otherwise the seconds until a token is available."""
+        with self._lock:
+            # Popping and re-inserting keeps the dict in least-recently-used order.
+            entry = self._buckets.pop(key, None)
+            tokens = rate.capacity if entry is None else min(rate.capacity, entry[0] + (now - entry[1]) * rate.per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate.per_second
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+            return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    _TAKE = """
+        INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1,
+            updated = :now
+        WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1
+        RETURNING tokens
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH, cleanup_interval: float = 60):
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        # Buckets idle for longer than the slowest refill are full again and can be dropped.
+        self.idle_seconds = 0.0
+        self._local = threading.local()
+        self._cleaned_at = time.time()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing a few buckets in a power cut is harmless, so skip the fsyncs.
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) "
+                "WITHOUT ROWID"
+            )
+            self._local.connection = connection
+        return connection
+
+    async def take(self, key: str, rate: Rate) -> float:
+        return await run_in_threadpool(self.take_now, key, rate, time.time())
+
+    def take_now(self, key: str, rate: Rate, now: float) -> float:
+        connection = self._connection()
+        params = {"key": key, "capacity": rate.capacity, "rate": rate.per_second, "now": now}
+        if connection.execute(self._TAKE, params).fetchone() is not None:
+            self._cleanup(connection, now)
+            return 0.0
+        row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = min(rate.capacity, row[0] + (now - row[1]) * rate.per_second) if row else rate.capacity
+        return max(0.0, (1 - tokens) / rate.per_second)
+
+    def _cleanup(self, connection, now: float) -> None:
+        if now - self._cleaned_at >= self.cleanup_interval and self.idle_seconds:
+            self._cleaned_at = now
+            connection.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_seconds,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM buckets").fetchone()[0]
+
+
+buckets = SQLiteBuckets() if RATE_LIMIT_BACKEND == "sqlite" else MemoryBuckets()
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _check(key: str, rate: Rate) -> None:
+    wait = await buckets.take(key, rate)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down.",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+def rate_limit(route: str, per_ip: str = "", per_user: str = ""):
+    """Dependency enforcing the per-IP and per-user limits of `route` (see Config.config RATE_LIMIT_*)."""
+    ip_rate, user_rate = parse_rate(per_ip), parse_rate(per_user)
+    for rate in (ip_rate, user_rate):
+        if rate is not None and isinstance(buckets, SQLiteBuckets):
+            buckets.idle_seconds = max(buckets.idle_seconds, rate.capacity / rate.per_second)
+
+    async def by_ip(request: Request):
+        if ip_rate is not None:
+            await _check(f"{route}:ip:{client_ip(request)}", ip_rate)
+
+    async def by_ip_and_user(request: Request, current_user=Depends(get_current_user)):
+        await by_ip(request)
+        await _check(f"{route}:user:{current_user.id}", user_rate)
+
+    async def unlimited():
+        return None
+
+    if not RATE_LIMIT_ENABLED:
+        return unlimited
+    return by_ip_and_user if user_rate is not None else by_ip
+
+
+class LoadShedMiddleware:
+    """Pure ASGI middleware that rejects new requests once too many are in flight in this worker."""
+
+    def __init__(self, app, max_in_flight: int = LOAD_SHED_MAX_IN_FLIGHT,
+                 expensive_in_flight: int = LOAD_SHED_EXPENSIVE_IN_FLIGHT, expensive_paths=EXPENSIVE_PATHS):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.expensive_in_flight = expensive_in_flight
+        self.expensive_paths = expensive_paths
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNSHED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        limit = self.expensive_in_flight if scope["path"] in self.expensive_paths else self.max_in_flight
+        if limit and self.in_flight >= limit:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry shortly."},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        # Every request runs on this worker's event loop, so the counter needs no lock.
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,245 @@
+"""Product search over name and description.
+
+On SQLite the products_fts FTS5 table indexes both columns with rowid equal
+to the product id, ranked with bm25 (name weighted above description).
+Every write path that changes a product's text calls index_products or
+unindex_products in its own transaction, and rebuild_search_index
+recreates the index from the products table:
+
+    python -m Utils.search rebuild
+
+Ranking is bounded. bm25 weighs each term by how many products contain
+it, which FTS5 works out by reading every match of every term, so a query
+is ranked only while each of its terms matches at most
+SEARCH_RANK_MAX_MATCHES products (one capped count per term decides).
+Broader queries list their matches newest first, which FTS5 reads
+straight off the index, so a term in half the catalog costs what a rare
+one does. Facets count at most the SEARCH_FACET_MAX_MATCHES newest matches
+and say so with truncated=true. Prefixes of 2 to 8 characters are read from
+their own prefix indexes (which roughly double the index size); FTS5 builds
+any longer prefix by merging every word it starts, so only a 9+ character
+prefix of a very common word costs in proportion to its matches. An index
+created with other options is dropped and rebuilt by create_search_index.
+
+Other backends, or SQLite builds without FTS5, fall back to a
+case-insensitive LIKE match ordered by id.
+
+Search terms are taken from the query as words; a trailing * makes a word a
+prefix match, and the last word is always matched as a prefix so partially
+typed queries work. The terms are quoted before they reach MATCH, so user
+input can never be parsed as FTS5 query syntax.
+"""
+import re
+import sys
+from sqlalchemy import and_, bindparam, case, column, func, literal, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from Config.config import SEARCH_RANK_MAX_MATCHES, SEARCH_FACET_MAX_MATCHES
+from Models.product import Product
+
+FTS_TABLE = "products_fts"
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+PRICE_FACETS = ((0, 10), (10, 50), (50, 100), (100, 500), (500, None))
+_FTS_OPTIONS = "name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6 7 8'"
+
+_TERM = re.compile(r"\w+\*?", re.UNICODE)
+_fts_available = {}
+
+_fts = table(FTS_TABLE, column("rowid"))
+_INDEX_ROWS = text(
+    f"INSERT INTO {FTS_TABLE} (rowid, name, description) SELECT id, name, description FROM products WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+_UNINDEX_ROWS = text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True))
+
+
+def create_search_index(bind) -> bool:
+    """Create the FTS5 table if the backend supports it; returns whether FTS is in use."""
+    if bind.dialect.name != "sqlite":
+        _fts_available[bind.url.database] = False
+        return False
+    try:
+        with bind.begin() as conn:
+            existing = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).scalar()
+            if existing is not None and f"fts5({_FTS_OPTIONS})" not in existing:
+                # Built with older options; ensure_search_index refills it at startup.
+                conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+            conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_FTS_OPTIONS})"))
+        available = True
+    except OperationalError:
+        available = False
+    _fts_available[bind.url.database] = available
+    return available
+
+
+def uses_fts(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind.url.database not in _fts_available:
+        # Only look for the table here: this may run on a read-only connection.
+        exists = bind.dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first() is not None
+        _fts_available[bind.url.database] = exists
+    return _fts_available[bind.url.database]
+
+
+def index_products(db: Session, product_ids) -> None:
+    """(Re)index the given products from their current rows, inside the caller's transaction."""
+    product_ids = list(product_ids)
+    if not product_ids or not uses_fts(db):
+        return
+    unindex_products(db, product_ids)
+    db.execute(_INDEX_ROWS, {"ids": product_ids})
+
+
+def unindex_products(db: Session, product_ids) -> None:
+    product_ids = list(product_ids)
+    if not product_ids or not uses_fts(db):
+        return
+    db.execute(_UNINDEX_ROWS, {"ids": product_ids})
+
+
+def rebuild_search_index(db: Session) -> int:
+    if not uses_fts(db):
+        return 0
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, name, description) SELECT id, name, description FROM products"))
+    db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    db.commit()
+    return db.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+def ensure_search_index(db: Session) -> None:
+    """Build the index once for a database whose products predate it."""
+    if not uses_fts(db):
+        return
+    indexed = db.execute(text(f"SELECT rowid FROM {FTS_TABLE} LIMIT 1")).first()
+    if indexed is None and db.query(Product.id).first() is not None:
+        rebuild_search_index(db)
+
+
+def parse_terms(query: str) -> list:
+    """Split a user query into (word, is_prefix) terms; the last word is always a prefix."""
+    terms = [(term.rstrip("*"), term.endswith("*")) for term in _TERM.findall(query)]
+    terms = [(word, prefix) for word, prefix in terms if word]
+    if terms:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def _match_expression(terms) -> str:
+    return " ".join('"{}"{}'.format(word.replace('"', '""'), "*" if prefix else "") for word, prefix in terms)
+
+
+def _match(terms):
+    return text(f"{FTS_TABLE} MATCH :match").bindparams(bindparam("match", _match_expression(terms), unique=True))
+
+
+def _capped_count(match, cap: int):
+    """The number of FTS matches, counting no further than cap + 1."""
+    capped = select(literal(1)).select_from(_fts).where(match).limit(cap + 1).subquery()
+    return select(func.count()).select_from(capped).scalar_subquery()
+
+
+def _filters(include_premium: bool, min_price, max_price, in_stock: bool) -> list:
+    filters = [Product.is_active == True]
+    if not include_premium:
+        filters.append(Product.is_premium == False)
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+    if in_stock:
+        filters.append(Product.stock > 0)
+    return filters
+
+
+def search_products(db: Session, query: str, include_premium: bool, limit: int, offset: int = 0,
+                    min_price=None, max_price=None, in_stock: bool = False, facets: bool = False) -> dict:
+    """One page of matching products, best match first (newest first when too broad to rank), plus optional facets."""
+    terms = parse_terms(query)
+    if not terms:
+        return {"items": [], "next_offset": None, "facets": None}
+    filters = _filters(include_premium, min_price, max_price, in_stock)
+
+    truncated = None
+    if uses_fts(db):
+        match = _match(terms)
+        counts = db.execute(select(*(_capped_count(_match([term]), SEARCH_RANK_MAX_MATCHES) for term in terms))).one()
+        if max(counts) <= SEARCH_RANK_MAX_MATCHES:
+            order = (text(f"bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})"), Product.id)
+        else:
+            # Too broad to rank: FTS5 hands back rowids newest first without reading the rest.
+            order = (_fts.c.rowid.desc(),)
+        stmt = select(Product).select_from(_fts).join(Product, Product.id == _fts.c.rowid).where(match, *filters)
+        stmt = stmt.order_by(*order)
+        if facets:
+            # The LIMIT keeps the newest matches as the outer loop, one primary-key read each.
+            newest = (
+                select(_fts.c.rowid).where(match).order_by(_fts.c.rowid.desc()).limit(SEARCH_FACET_MAX_MATCHES)
+                .subquery()
+            )
+            matched = select(Product).join(newest, newest.c.rowid == Product.id).where(*filters)
+            truncated = _capped_count(match, SEARCH_FACET_MAX_MATCHES) > SEARCH_FACET_MAX_MATCHES
+    else:
+        conditions = [
+            or_(Product.name.ilike(f"%{word}%"), Product.description.ilike(f"%{word}%"))
+            for word, _ in terms
+        ]
+        matched = select(Product).where(and_(*conditions), *filters)
+        stmt = matched.order_by(Product.id)
+
+    rows = db.execute(stmt.limit(limit + 1).offset(offset)).scalars().all()
+    result = {
+        "items": rows[:limit],
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "facets": None,
+    }
+    if facets:
+        result["facets"] = _facets(db, matched.subquery(), truncated)
+    return result
+
+
+def _facets(db: Session, matched, truncated=None) -> dict:
+    def count_where(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    price_buckets = [
+        count_where(and_(matched.c.price >= low, matched.c.price < high) if high is not None else matched.c.price >= low)
+        for low, high in PRICE_FACETS
+    ]
+    row = db.execute(select(
+        func.count(), count_where(matched.c.stock > 0), count_where(matched.c.is_premium == True), *price_buckets,
+        truncated if truncated is not None else literal(False)
+    )).one()
+    total, in_stock, premium, *buckets, truncated = (value or 0 for value in row)
+    return {
+        "total": total,
+        "truncated": bool(truncated),
+        "in_stock": in_stock,
+        "premium": premium,
+        "price_ranges": [
+            {"min": low, "max": high, "count": count} for (low, high), count in zip(PRICE_FACETS, buckets)
+        ],
+    }
+
+
+def main(argv):
+    from Database.database import engine, SessionLocal
+    import Models.user, Models.order  # noqa: F401
+
+    if len(argv) < 2 or argv[1] != "rebuild":
+        raise SystemExit("usage: python -m Utils.search rebuild")
+    if not create_search_index(engine):
+        raise SystemExit("FTS5 is not available on this database; search uses the LIKE fallback.")
+    db = SessionLocal()
+    try:
+        print(f"Indexed {rebuild_search_index(db)} products.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
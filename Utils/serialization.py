@@ -0,0 +1,84 @@
+"""Fast path for the read-only list endpoints.
+
+The list routes select plain column tuples instead of ORM entities and turn
+them into dicts keyed in the order of the response model's fields, then
+encode the page once. The bytes are identical to what FastAPI renders
+through ProductOut/UserOut/OrderOut: the same keys in the same order,
+datetimes as ISO 8601, non-ASCII text unescaped, no whitespace. The
+response_model on each route still documents the shape, and the routes send
+page_body() through Utils.conditional for their ETag and compression.
+
+orjson is used when it is installed and the standard json module
+otherwise; both produce the same output.
+"""
+import json
+from datetime import datetime
+from sqlalchemy import select
+from Models.order import Order, OrderItem
+from Models.product import Product
+from Models.user import User
+from Schemas.order import OrderOut, OrderItemOut
+from Schemas.product import ProductOut
+from Schemas.user import UserOut
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+PRODUCT_COLUMNS = (Product.name, Product.description, Product.price, Product.stock,
+                   Product.is_active, Product.is_premium, Product.id, Product.created_at)
+USER_COLUMNS = (User.id, User.name, User.email, User.is_active, User.is_admin, User.is_premium, User.created_at)
+ORDER_COLUMNS = (Order.id, Order.total_amount, Order.status, Order.created_at)
+ITEM_COLUMNS = (OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+
+
+def _fields(schema, columns) -> tuple:
+    names = tuple(column.key for column in columns)
+    expected = tuple(name for name in schema.model_fields if name != "items")
+    if names != expected:
+        raise RuntimeError(f"{schema.__name__} fields {expected} do not match the selected columns {names}")
+    return names
+
+
+PRODUCT_FIELDS = _fields(ProductOut, PRODUCT_COLUMNS)
+USER_FIELDS = _fields(UserOut, USER_COLUMNS)
+ORDER_FIELDS = _fields(OrderOut, ORDER_COLUMNS)
+ITEM_FIELDS = _fields(OrderItemOut, ITEM_COLUMNS)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode()
+
+
+def rows_as_dicts(rows, fields) -> list:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def items_for(order_ids):
+    """One statement for the items of a page of orders, as (order_id, *ITEM_COLUMNS) rows."""
+    return (
+        select(OrderItem.order_id, *ITEM_COLUMNS)
+        .where(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.order_id, OrderItem.id)
+    )
+
+
+def orders_with_items(orders, items) -> list:
+    """Combine order rows (ORDER_COLUMNS) with (order_id, *ITEM_COLUMNS) rows into OrderOut-shaped dicts."""
+    by_order = {}
+    for order_id, *item in items:
+        by_order.setdefault(order_id, []).append(dict(zip(ITEM_FIELDS, item)))
+    return [dict(zip(ORDER_FIELDS, order), items=by_order.get(order[0], [])) for order in orders]
+
+
+def page_body(items, next_cursor) -> bytes:
+    return dumps({"items": items, "next_cursor": next_cursor})
@@ -0,0 +1,46 @@
+"""Startup phases and readiness for the app's lifespan.
+
+create_app's lifespan runs each warm-up step inside report.phase(name), which
+records how long it took and logs it. The readiness probe reports ready only
+once every phase has finished, and flips back to not ready when shutdown
+begins so a load balancer stops routing to a draining worker.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class StartupReport:
+    def __init__(self):
+        self.ready = False
+        self.phases = {}
+        self.skipped = []
+        self._start = time.perf_counter()
+        self.total_ms = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+            logger.info("startup phase %s took %.1f ms", name, self.phases[name])
+
+    def skip(self, name: str) -> None:
+        self.skipped.append(name)
+
+    def finish(self) -> None:
+        self.total_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        self.ready = True
+        logger.info("startup complete in %.1f ms", self.total_ms)
+
+    def summary(self) -> dict:
+        return {
+            "ready": self.ready,
+            "total_ms": self.total_ms,
+            "phases_ms": dict(self.phases),
+            "skipped": list(self.skipped),
+        }
@@ -0,0 +1,119 @@
+"""Running totals behind /admin/stats.
+
+The admin_stats table holds a single row that every write path adjusts in
+its own transaction through bump_stats, so the dashboard reads one row
+instead of aggregating four tables. rebuild_stats recomputes the row from
+the source tables and verify_stats reports any drift:
+
+    python -m Utils.stats verify
+    python -m Utils.stats rebuild
+"""
+import sys
+from datetime import datetime
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from Models.stats import AdminStatsCounter
+from Models.user import User
+from Models.order import Order
+from Models.product import Product
+
+STATS_ROW_ID = 1
+FIELDS = ("total_users", "total_orders", "total_products", "total_revenue")
+
+
+def bump_stats(db: Session, users: int = 0, orders: int = 0, products: int = 0, revenue: float = 0.0) -> None:
+    """Apply deltas to the totals row inside the caller's transaction.
+
+    Until the row has been built by rebuild_stats this is a no-op; the
+    rebuild counts everything committed so far.
+    """
+    deltas = {"total_users": users, "total_orders": orders, "total_products": products, "total_revenue": revenue}
+    values = {
+        field: getattr(AdminStatsCounter, field) + delta
+        for field, delta in deltas.items() if delta
+    }
+    if not values:
+        return
+    db.execute(
+        update(AdminStatsCounter)
+        .where(AdminStatsCounter.id == STATS_ROW_ID)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def compute_stats(db: Session) -> dict:
+    return {
+        "total_users": db.query(func.count(User.id)).scalar(),
+        "total_orders": db.query(func.count(Order.id)).scalar(),
+        "total_products": db.query(func.count(Product.id)).scalar(),
+        "total_revenue": db.query(func.coalesce(func.sum(Order.total_amount), 0)).scalar(),
+    }
+
+
+def read_stats(db: Session):
+    row = db.query(AdminStatsCounter).filter(AdminStatsCounter.id == STATS_ROW_ID).first()
+    if row is None:
+        return None
+    return {field: getattr(row, field) for field in FIELDS}
+
+
+def rebuild_stats(db: Session) -> dict:
+    totals = compute_stats(db)
+    row = db.query(AdminStatsCounter).filter(AdminStatsCounter.id == STATS_ROW_ID).first()
+    if row is None:
+        row = AdminStatsCounter(id=STATS_ROW_ID)
+        db.add(row)
+    for field, value in totals.items():
+        setattr(row, field, value)
+    row.rebuilt_at = datetime.utcnow()
+    db.commit()
+    return totals
+
+
+def ensure_stats(db: Session) -> None:
+    if read_stats(db) is None:
+        rebuild_stats(db)
+
+
+def verify_stats(db: Session) -> dict:
+    """Return {field: (stored, actual)} for every total that has drifted."""
+    stored = read_stats(db) or {}
+    actual = compute_stats(db)
+    drift = {}
+    for field in FIELDS:
+        if field == "total_revenue":
+            matches = abs((stored.get(field) or 0.0) - actual[field]) < 0.005
+        else:
+            matches = stored.get(field) == actual[field]
+        if not matches:
+            drift[field] = (stored.get(field), actual[field])
+    return drift
+
+
+def main(argv):
+    from Database.database import Base, engine, SessionLocal
+
+    command = argv[1] if len(argv) > 1 else "verify"
+    if command not in ("verify", "rebuild"):
+        raise SystemExit("usage: python -m Utils.stats [verify|rebuild]")
+
+    Base.metadata.create_all(bind=engine, tables=[AdminStatsCounter.__table__])
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            print(f"Rebuilt admin stats: {rebuild_stats(db)}")
+            return
+        drift = verify_stats(db)
+        if not drift:
+            print("Admin stats match the source tables.")
+            return
+        for field, (stored, actual) in drift.items():
+            print(f"{field}: stored={stored} actual={actual}")
+        raise SystemExit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,53 @@
+"""Monotonic per-dataset version counters.
+
+Writers bump a key in the same transaction as the change, so any process can
+tell whether its in-memory copy of that dataset is stale by comparing one
+integer read by primary key. The same integers make the ETags of the list
+endpoints (Utils.conditional), so those keys cover whatever their pages
+show: STOCK moves with every reservation, USERS and ORDERS with any change
+to those tables, and user_orders(user_id) with one user's orders.
+"""
+from sqlalchemy.orm import Session
+from Database.upsert import upsert_increment, upsert_increment_rows
+from Models.version import DataVersion
+
+CATALOG = "catalog"
+STOCK = "stock"
+USERS = "users"
+# Existing accounts only (flags, deletion): what Auth.user_cache snapshots.
+ACCOUNTS = "accounts"
+ORDERS = "orders"
+
+
+def user_orders(user_id: int) -> str:
+    return f"orders:{user_id}"
+
+
+def order_version_keys(user_id: int) -> tuple:
+    """The keys any change to one user's orders bumps."""
+    return ORDERS, user_orders(user_id)
+
+
+def bump_version(db: Session, key: str) -> int:
+    upsert_increment(db, DataVersion.__table__, {"key": key}, {"version": 1})
+    return get_version(db, key)
+
+
+def bump_versions(db: Session, *keys: str) -> None:
+    """bump_version for several distinct keys in one upsert, without reading the new values back."""
+    upsert_increment_rows(db, DataVersion.__table__, ("key",), [{"key": key, "version": 1} for key in keys])
+
+
+def bump_order_versions(db: Session, user_id: int) -> None:
+    bump_versions(db, *order_version_keys(user_id))
+
+
+def get_version(db: Session, key: str) -> int:
+    version = db.query(DataVersion.version).filter(DataVersion.key == key).scalar()
+    return version or 0
+
+
+def get_versions(db: Session, keys) -> tuple:
+    """The versions of `keys`, in order, from one query."""
+    found = dict(db.query(DataVersion.key, DataVersion.version).filter(DataVersion.key.in_(keys)).all())
+    return tuple(found.get(key) or 0 for key in keys)
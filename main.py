@@ -1,15 +1,124 @@
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from Database.database import Base, engine
+from Database.database import Base, engine, SessionLocal, ReadSessionLocal, ALL_ENGINES, warm_pools, warm_async_pools
 from Routes.auth import router as auth_router
 from Routes.product import router as product_router
 from Routes.order import router as order_router
 from Routes.admin import router as admin_router
+from Routes.bulk import router as bulk_router
+from Routes.export import router as export_router
+from Routes.analytics import router as analytics_router
+from Routes.metrics import router as metrics_router
+from Routes.health import router as health_router
+from Utils.email_sender import email_dispatcher
+from Config.config import (
+    EMAIL_DISPATCHER_ENABLED, METRICS_ENABLED, AUTO_CREATE_SCHEMA, STARTUP_WARMUP_ENABLED, CATALOG_CACHE_ENABLED,
+    LOAD_SHED_MAX_IN_FLIGHT
+)
+from Utils.stats import ensure_stats
+from Utils.analytics import ensure_rollups
+from Utils.search import create_search_index, ensure_search_index
+from Utils.catalog_cache import catalog_cache
+from Utils.metrics import MetricsMiddleware, instrument_engines
+from Utils.profiler import ProfilerMiddleware
+from Utils.rate_limit import LoadShedMiddleware
+from Utils.startup import StartupReport
+from Auth import auth_utils, jwt
+from Auth.revocation import token_denylist
 
-app = FastAPI()
+def create_schema():
+    """Create missing tables and the search index; production deploys run this once instead of on every boot."""
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
 
-Base.metadata.create_all(bind=engine)
+def build_admin_stats():
+    db = SessionLocal()
+    try:
+        ensure_stats(db)
+        ensure_rollups(db)
+        ensure_search_index(db)
+    finally:
+        db.close()
 
-app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
-app.include_router(product_router, prefix="/products", tags=["Products"])
-app.include_router(order_router, prefix="/orders", tags=["Orders"])
-app.include_router(admin_router, prefix="/admin", tags=["Admin"])
\ No newline at end of file
+def load_revocations():
+    db = ReadSessionLocal()
+    try:
+        token_denylist.load(db)
+    finally:
+        db.close()
+
+def preload_catalog():
+    db = ReadSessionLocal()
+    try:
+        catalog_cache.ensure_fresh(db)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report = app.state.startup = StartupReport()
+    if AUTO_CREATE_SCHEMA:
+        with report.phase("schema"):
+            create_schema()
+    else:
+        report.skip("schema")
+    with report.phase("admin_stats"):
+        build_admin_stats()
+    with report.phase("revocations"):
+        load_revocations()
+    if STARTUP_WARMUP_ENABLED:
+        with report.phase("db_pools"):
+            warm_pools()
+            await warm_async_pools()
+        with report.phase("auth"):
+            auth_utils.warm_up()
+            jwt.warm_up()
+        if CATALOG_CACHE_ENABLED:
+            with report.phase("catalog"):
+                preload_catalog()
+    else:
+        report.skip("warm-up")
+    if EMAIL_DISPATCHER_ENABLED:
+        with report.phase("email_dispatcher"):
+            email_dispatcher.start()
+    report.finish()
+    try:
+        yield
+    finally:
+        report.ready = False
+        email_dispatcher.stop()
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    # Probes work before the lifespan has run (e.g. the app is mounted but not started yet).
+    app.state.startup = StartupReport()
+
+    # Innermost, so shed requests still show up in the profiler and metrics.
+    if LOAD_SHED_MAX_IN_FLIGHT > 0:
+        app.add_middleware(LoadShedMiddleware)
+    app.add_middleware(ProfilerMiddleware)
+
+    if METRICS_ENABLED:
+        instrument_engines(ALL_ENGINES)
+        app.add_middleware(MetricsMiddleware)
+
+    app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+    app.include_router(product_router, prefix="/products", tags=["Products"])
+    app.include_router(order_router, prefix="/orders", tags=["Orders"])
+    app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+    app.include_router(bulk_router, prefix="/admin", tags=["Admin"])
+    app.include_router(export_router, prefix="/admin", tags=["Admin"])
+    app.include_router(analytics_router, prefix="/admin/analytics", tags=["Analytics"])
+    app.include_router(health_router, prefix="/health", tags=["Health"])
+    if METRICS_ENABLED:
+        app.include_router(metrics_router)
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["create-schema"]:
+        raise SystemExit("usage: python -m main create-schema")
+    create_schema()
+    print("Schema created.")